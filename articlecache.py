@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import time
+
+from sqlitedb import SQLiteDatabase
+
+DEFAULT_CACHE_PATH = os.getenv("NYT_CACHE_DB", os.path.join("data", "nytimes_cache.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS article_cache (
+    url TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS article_cache_by_use ON article_cache (used_at);
+
+CREATE TABLE IF NOT EXISTS delivered (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    delivered_at REAL NOT NULL
+);
+"""
+
+
+def content_hash(payload):
+    """Stable digest of an API payload, so a changed story is sent again"""
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ArticleCache(SQLiteDatabase):
+    """Extracted article paragraphs keyed by URL.
+
+    Entries older than `ttl` seconds are refetched, so edits to a story are picked up.
+    Once the cached text exceeds `max_bytes`, the least recently used entries are dropped.
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=None, max_bytes=None):
+        super().__init__(path)
+        self.ttl = ttl if ttl is not None else float(os.getenv("NYT_ARTICLE_CACHE_TTL", str(6 * 3600)))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("NYT_ARTICLE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url):
+        """Cached paragraphs for `url`, or None when missing or expired"""
+        now = time.time()
+        with self.connection() as conn:
+            row = conn.execute("SELECT content, stored_at FROM article_cache WHERE url = ?", (url,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE article_cache SET used_at = ? WHERE url = ?", (now, url))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, url, paragraphs):
+        content = json.dumps(paragraphs, ensure_ascii=False)
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT INTO article_cache (url, content, size, stored_at, used_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET content = excluded.content, size = excluded.size, "
+                "stored_at = excluded.stored_at, used_at = excluded.used_at",
+                (url, content, len(content.encode("utf-8")), now, now),
+            )
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits in max_bytes"""
+        with self.connection() as conn:
+            conn.execute("DELETE FROM article_cache WHERE stored_at < ?", (time.time() - self.ttl,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM article_cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for url, size in conn.execute("SELECT url, size FROM article_cache ORDER BY used_at").fetchall():
+                conn.execute("DELETE FROM article_cache WHERE url = ?", (url,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+class DeliveryLedger(SQLiteDatabase):
+    """Stories the API has accepted, keyed by URL plus a hash of what was sent"""
+
+    schema = SCHEMA
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        super().__init__(path)
+
+    def delivered(self, url, digest):
+        row = self.connection().execute("SELECT content_hash FROM delivered WHERE url = ?", (url,)).fetchone()
+        return row is not None and row[0] == digest
+
+    def record(self, url, digest):
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT INTO delivered (url, content_hash, delivered_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET content_hash = excluded.content_hash, "
+                "delivered_at = excluded.delivered_at",
+                (url, digest, time.time()),
+            )
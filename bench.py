@@ -0,0 +1,249 @@
+"""Offline throughput, parse and API startup benchmarks (scrapers run against benchserver.py).
+
+    python bench.py                  # run and compare with bench_baseline.json
+    python bench.py --save-baseline  # record the current numbers as the baseline
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from benchserver import StandInConfig, StandInServer, article_html, homepage_html, joke_page_html
+from logconfig import configure_logging
+from metrics import ITEMS_SCRAPED
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+# Effectively unthrottled: the benchmark measures the scrapers, not the politeness delay
+BENCH_RATE = 1e6
+# Modules an API worker should only load once it runs a scrape job
+SCRAPER_MODULES = ("nytimes", "jokes", "requests", "bs4", "lxml", "soupsieve")
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start, sum(1 for name in {modules!r} if name in sys.modules))
+"""
+
+log = logging.getLogger(__name__)
+
+
+@contextmanager
+def scratch_dir():
+    """Run in an empty working directory so jokes/, data/ and the database are throwaway"""
+    previous = os.getcwd()
+    directory = tempfile.mkdtemp(prefix="scraper-bench-")
+    os.chdir(directory)
+    try:
+        yield directory
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def best_of(fn, repeat, rounds=5):
+    """Fastest average seconds per call of `fn` over several rounds of `repeat` calls"""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best
+
+
+def bench_jokes(server, concurrency=1):
+    import jokes
+
+    jokes.BASE_URL = f"{server.url}/jokes"
+    before = ITEMS_SCRAPED.value(kind="joke")
+    with scratch_dir():
+        start = time.perf_counter()
+        jokes.main(max_loads=server.config.loads + 1, concurrency=concurrency, rate=BENCH_RATE)
+        elapsed = time.perf_counter() - start
+    scraped = ITEMS_SCRAPED.value(kind="joke") - before
+    return {
+        "jokes_per_second": {"value": scraped / elapsed, "unit": "jokes/s", "better": "higher"},
+        "jokes_scraped": {"value": scraped, "unit": "jokes", "better": "info"},
+    }
+
+
+def bench_nytimes(server):
+    from nytimes import NYTimesScraper
+
+    os.environ["NYT_BASE_URL"] = server.url
+    os.environ["CAPI_URL"] = server.url
+    os.environ.pop("CAPI_BATCH_PATH", None)
+    with scratch_dir():
+        scraper = NYTimesScraper(rate=BENCH_RATE)
+        start = time.perf_counter()
+        stories = scraper.scrape_stories_with_content(max_stories=server.config.stories)
+        elapsed = time.perf_counter() - start
+        scraper.delivery.close()
+    scraped = sum(1 for story in stories if story.get("full_content"))
+    return {
+        "stories_per_second": {"value": scraped / elapsed, "unit": "stories/s", "better": "higher"},
+        "stories_scraped": {"value": scraped, "unit": "stories", "better": "info"},
+    }
+
+
+def bench_parse(config, repeat=50):
+    import jokes
+    from nytimes import NYTimesScraper
+    from parsing import make_soup
+
+    with scratch_dir():
+        scraper = NYTimesScraper()
+        homepage = make_soup(homepage_html(config.stories), label="bench")
+        story_elements = homepage.select('[data-tpl="sli"]')
+        article_markup = article_html(0, config.paragraphs).encode("utf-8")
+        article_soup = make_soup(article_markup, label="bench")
+        joke_markup = joke_page_html("bench", 0, config.jokes_per_page)
+
+        def extract_stories():
+            skip = scraper.absent_selectors(story_elements)
+            for element in story_elements:
+                scraper.extract_story_data(element, skip)
+
+        timings = {
+            "extract_story_data": best_of(extract_stories, repeat) / len(story_elements),
+            "extract_article_content": best_of(lambda: scraper.extract_article_content(article_soup), repeat),
+            "parse_article": best_of(lambda: scraper.parse_article(article_markup), repeat),
+            "parse_jokes": best_of(lambda: jokes.parse_jokes(joke_markup), repeat),
+        }
+    return {
+        f"{name}_us": {"value": seconds * 1e6, "unit": "us/call", "better": "lower"}
+        for name, seconds in timings.items()
+    }
+
+
+def bench_startup(rounds=5):
+    """Import time of the API app in a fresh interpreter, as paid by every new worker"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    script = STARTUP_SCRIPT.format(modules=SCRAPER_MODULES)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo, os.getenv("PYTHONPATH")])))
+    env.pop("CORPUS_SNAPSHOT_DIR", None)
+    best = float("inf")
+    loaded = 0
+    with scratch_dir() as directory:
+        # main.py reads jokes/ relative to the working directory
+        os.makedirs(os.path.join(directory, "jokes"))
+        for _ in range(rounds):
+            output = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+            seconds, loaded = output.stdout.split()
+            best = min(best, float(seconds))
+    return {
+        "api_import_ms": {"value": best * 1000, "unit": "ms", "better": "lower"},
+        "api_scraper_modules_loaded": {"value": int(loaded), "unit": "modules", "better": "info"},
+    }
+
+
+def run(config, suites, concurrency=1, repeat=50):
+    # Nothing in a benchmark run should touch the real sites or an on-disk cache
+    os.environ["SCRAPER_HTTP_CACHE"] = "off"
+    results = {}
+    with StandInServer(config) as server:
+        if "jokes" in suites:
+            results.update(bench_jokes(server, concurrency=concurrency))
+        if "nytimes" in suites:
+            results.update(bench_nytimes(server))
+    if "parse" in suites:
+        results.update(bench_parse(config, repeat=repeat))
+    if "startup" in suites:
+        results.update(bench_startup())
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Names of results that are worse than the baseline by more than `tolerance`"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or result["better"] == "info" or not base["value"]:
+            continue
+        change = result["value"] / base["value"] - 1
+        if (result["better"] == "higher" and change < -tolerance) or (result["better"] == "lower" and change > tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def report(results, baseline=None):
+    for name, result in results.items():
+        line = f"{name:28} {result['value']:12.2f} {result['unit']}"
+        base = (baseline or {}).get(name)
+        if base and base["value"]:
+            line += f"  ({result['value'] / base['value'] - 1:+.1%} vs baseline {base['value']:.2f})"
+        print(line)
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, config, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"config": config.to_dict(), "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against a local stand-in server")
+    parser.add_argument("--suite", action="append", choices=["jokes", "nytimes", "parse", "startup"],
+                        help="Suites to run (default: all)")
+    parser.add_argument("--categories", type=int, default=6)
+    parser.add_argument("--loads", type=int, default=5, help="'Load more' pages per joke category")
+    parser.add_argument("--jokes-per-page", type=int, default=20)
+    parser.add_argument("--stories", type=int, default=10, help="Stories on the homepage (the scraper reads at most 10)")
+    parser.add_argument("--paragraphs", type=int, default=30, help="Paragraphs per article")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every stand-in response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stand-in responses that fail")
+    parser.add_argument("--concurrency", type=int, default=1, help="Passed to jokes.main()")
+    parser.add_argument("--repeat", type=int, default=50, help="Calls per round in the parse microbenchmarks")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown relative to the baseline before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+    configure_logging(level="WARNING")
+
+    config = StandInConfig(
+        categories=args.categories, jokes_per_page=args.jokes_per_page, loads=args.loads, stories=args.stories,
+        paragraphs=args.paragraphs, latency=args.latency, error_rate=args.error_rate,
+    )
+    results = run(config, args.suite or ["jokes", "nytimes", "parse", "startup"], concurrency=args.concurrency,
+                  repeat=args.repeat)
+
+    if args.save_baseline:
+        report(results)
+        save_baseline(args.baseline, config, results)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    stored = load_baseline(args.baseline)
+    if stored is None:
+        report(results)
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    if stored["config"] != config.to_dict():
+        report(results)
+        print("Baseline was recorded with different settings; not comparing")
+        return 0
+
+    report(results, stored["results"])
+    regressions = compare(results, stored["results"], args.tolerance)
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,244 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Page chrome around the content the scrapers look for, so strainers and selectors
+# have roughly as much markup to skip as on the real sites
+_CHROME = "".join(
+    f'<div class="promo promo-{i}"><a href="/promo/{i}">Promo {i}</a><p>Unrelated teaser text {i}</p></div>'
+    for i in range(40)
+)
+_SCRIPT = "<script>" + "var x = 1;" * 400 + "</script>"
+
+AD_PARAGRAPHS = [
+    "Subscribe today to get unlimited access to all of our journalism, games and recipes for one low price.",
+    "Sign up for the morning newsletter and get the best of our reporting in your inbox every weekday.",
+    "Play these games: the crossword, spelling bee and connections are all included with your account.",
+]
+
+
+def category_slugs(count):
+    return [f"category-{i}" for i in range(count)]
+
+
+def category_index_html(base_url, slugs):
+    """laughfactory.com /jokes page with its left navigation block"""
+    items = "".join(
+        f'<li><a href="{base_url}/{slug}"><span>{slug.replace("-", " ").title()}</span></a></li>'
+        for slug in slugs
+    )
+    return (
+        f"<html><head>{_SCRIPT}</head><body>{_CHROME}"
+        f'<div class="left-navigation-block"><ul>{items}</ul></div>'
+        f"{_CHROME}</body></html>"
+    )
+
+
+def joke_blocks_html(slug, load_num, count):
+    blocks = []
+    for i in range(count):
+        blocks.append(
+            '<div class="jokes-main-pane-block jokes-main-pane-block--small">'
+            f'<div class="person-avatar-info small-avatar"><small>user{load_num}_{i}</small></div>'
+            f'<div class="joke-text-holder"><p>Joke {i} from load {load_num} of {slug}: '
+            "why did the benchmark cross the road? To get to the other side of the baseline.</p></div>"
+            '<div class="joke-actions"><a href="#">Like</a><a href="#">Share</a></div>'
+            "</div>"
+        )
+    return "".join(blocks)
+
+
+def joke_page_html(slug, load_num, count):
+    """A category page (load 0) or a "Load More" ajax fragment (later loads)"""
+    blocks = joke_blocks_html(slug, load_num, count)
+    if load_num:
+        return blocks
+    return f"<html><head>{_SCRIPT}</head><body>{_CHROME}<div class=\"jokes-list\">{blocks}</div>{_CHROME}</body></html>"
+
+
+def article_path(n):
+    return f"/2025/01/{n % 28 + 1:02d}/world/benchmark-story-{n}.html"
+
+
+def homepage_html(count):
+    """nytimes.com homepage with `count` story list items"""
+    stories = []
+    for n in range(count):
+        stories.append(
+            '<div data-tpl="sli"><div class="story-wrapper">'
+            f'<div data-tpl="h"><a href="{article_path(n)}"><h3>Benchmark headline number {n} for the front page</h3></a></div>'
+            f'<p class="css-summary">A summary of benchmark story {n} that is long enough to be kept.</p>'
+            f'<time datetime="2025-01-01">Jan. 1, 2025</time>'
+            "</div></div>"
+        )
+    return f"<html><head>{_SCRIPT}</head><body>{_CHROME}<section>{''.join(stories)}</section>{_CHROME}</body></html>"
+
+
+def article_html(n, paragraphs):
+    """nytimes.com article page: an articleBody section with body paragraphs and a few ads"""
+    body = []
+    for i in range(paragraphs):
+        body.append(
+            f'<p class="css-at9mc1">Paragraph {i} of benchmark story {n}. '
+            "It carries enough words to pass the length filter applied to article text.</p>"
+        )
+        if i % 10 == 5:
+            body.append(f"<p>{AD_PARAGRAPHS[i % len(AD_PARAGRAPHS)]}</p>")
+    return (
+        f"<html><head>{_SCRIPT}</head><body>{_CHROME}"
+        f'<article><h1>Benchmark headline number {n}</h1>'
+        f'<section name="articleBody"><div class="StoryBodyCompanionColumn">{"".join(body)}</div></section>'
+        f"</article>{_CHROME}</body></html>"
+    )
+
+
+class StandInConfig:
+    """Shape of the fake sites plus injected latency and failures"""
+
+    def __init__(self, categories=6, jokes_per_page=20, loads=5, stories=10, paragraphs=30,
+                 latency=0.0, error_rate=0.0, error_status=503, seed=0):
+        self.categories = categories
+        self.jokes_per_page = jokes_per_page
+        self.loads = loads
+        self.stories = stories
+        self.paragraphs = paragraphs
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type="text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def inject(self):
+        """Apply the configured latency; returns True if this request should fail"""
+        config = self.server.config
+        if config.latency:
+            time.sleep(config.latency)
+        if self.server.should_fail():
+            self.send_body(config.error_status, "injected failure", "text/plain")
+            return True
+        return False
+
+    def do_GET(self):
+        self.server.count("GET")
+        if self.inject():
+            return
+        config = self.server.config
+        url = urlparse(self.path)
+        slugs = category_slugs(config.categories)
+
+        if url.path == "/jokes":
+            return self.send_body(200, category_index_html(f"{self.server.url}/jokes", slugs))
+        if url.path == "/jokes/ajax/load_more":
+            query = parse_qs(url.query)
+            load_num = int(query.get("page", ["1"])[0]) - 1
+            slug = query.get("category", [""])[0]
+            count = config.jokes_per_page if slug in slugs and load_num <= config.loads else 0
+            return self.send_body(200, joke_page_html(slug, load_num, count))
+        if url.path.startswith("/jokes/") and url.path[len("/jokes/"):] in slugs:
+            return self.send_body(200, joke_page_html(url.path[len("/jokes/"):], 0, config.jokes_per_page))
+        if url.path in ("", "/"):
+            return self.send_body(200, homepage_html(config.stories))
+        if url.path.startswith("/2025/"):
+            n = int(url.path.rsplit("-", 1)[1].split(".")[0])
+            return self.send_body(200, article_html(n, config.paragraphs))
+        self.send_body(404, "not found", "text/plain")
+
+    def do_POST(self):
+        self.server.count("POST")
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.inject():
+            return
+        if self.path.startswith("/news/"):
+            payload = json.loads(body or b"null")
+            self.server.count("stories", len(payload) if isinstance(payload, list) else 1)
+            self.server.record(self.path, payload)
+            return self.send_body(201, json.dumps({"ok": True}), "application/json")
+        self.send_body(404, "not found", "text/plain")
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local copy of laughfactory.com, nytimes.com and the CAPI news endpoint.
+
+    Serves /jokes, /jokes/<slug> and /jokes/ajax/load_more like laughfactory.com, / and
+    /2025/.../*.html like nytimes.com, and accepts POSTs to /news/create.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), StandInHandler)
+        self.config = config or StandInConfig()
+        self.random = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+        # (path, payload) of every POST the API endpoints accepted
+        self.received = []
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def should_fail(self):
+        if not self.config.error_rate:
+            return False
+        with self.lock:
+            return self.random.random() < self.config.error_rate
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+    def record(self, path, payload):
+        with self.lock:
+            self.received.append((path, payload))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve stand-in pages for the scrapers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to delay every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    args = parser.parse_args()
+    server = StandInServer(StandInConfig(latency=args.latency, error_rate=args.error_rate), port=args.port)
+    print(f"Serving on {server.url} (LAUGHFACTORY_URL, NYT_BASE_URL and CAPI_URL can all point here)")
+    server.serve_forever()
@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+
+DEFAULT_CHECKPOINT_DIR = os.path.join("data", "checkpoints")
+# How many of the newest jokes are remembered to detect where the previous crawl started
+KNOWN_FINGERPRINTS = 100
+
+log = logging.getLogger(__name__)
+
+
+class CategoryCheckpoint:
+    """Crawl progress for one category, saved after every page so a crawl can be resumed.
+
+    `known` holds fingerprints of the newest jokes from the last completed crawl; an
+    incremental crawl stops paging once it reaches one of them. While a crawl is in
+    progress, `last_page` records how far it got; the jokes it scraped so far are in the
+    category's partial NDJSON output.
+    """
+
+    def __init__(self, category_name, directory=DEFAULT_CHECKPOINT_DIR):
+        self.category_name = category_name
+        self.path = os.path.join(directory, f"{category_name}.json")
+        self.complete = True
+        self.last_page = -1
+        self.known = set()
+        self.load()
+
+    @property
+    def in_progress(self):
+        return not self.complete
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable checkpoint %s: %s", self.path, e)
+            return
+        self.complete = data.get("complete", True)
+        self.last_page = data.get("last_page", -1)
+        self.known = set(data.get("known", []))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "complete": self.complete,
+            "last_page": self.last_page,
+            "known": sorted(self.known),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def is_known(self, fp):
+        return fp in self.known
+
+    def begin(self):
+        """Start a new crawl, or keep the current state when resuming an interrupted one"""
+        if self.complete:
+            self.complete = False
+            self.last_page = -1
+            self.save()
+
+    def record_page(self, load_num):
+        """Called once a page's jokes have been flushed to the partial output"""
+        self.last_page = load_num
+        self.save()
+
+    def finish(self):
+        """Mark the crawl as having reached its natural end (no more pages or known jokes)"""
+        self.complete = True
+
+    def commit(self, newest_fingerprints):
+        """Called once a completed crawl is saved; remembers its newest jokes for next time"""
+        self.last_page = -1
+        self.known = set(newest_fingerprints[:KNOWN_FINGERPRINTS])
+        self.save()
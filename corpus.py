@@ -0,0 +1,147 @@
+import gzip
+import hashlib
+import logging
+import mmap
+import os
+import threading
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_SNAPSHOT_DIR = os.path.join("data", "corpus")
+
+log = logging.getLogger(__name__)
+
+
+class CorpusSnapshot:
+    """Immutable combined corpus plus its gzip encoding and ETags"""
+
+    def __init__(self, body, gzipped=None):
+        self.body = body
+        self.gzipped = gzipped if gzipped is not None else gzip.compress(body, compresslevel=6, mtime=0)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+    def etag_for(self, gzipped):
+        return self.gzip_etag if gzipped else self.etag
+
+    def matches(self, if_none_match, gzipped=False):
+        """True when an If-None-Match header names the ETag of the encoding being served.
+
+        The other encoding's ETag doesn't count: a cache holding the gzip body must not be
+        told to reuse it for a client that can't decode it.
+        """
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return self.etag_for(gzipped) in tags
+
+
+class CombinedCorpus:
+    """In-process cache of every file in the jokes directory joined into one document.
+
+    The snapshot is rebuilt only when a file is added or removed or its mtime or size
+    changes, so repeated reads cost one directory scan.
+    """
+
+    def __init__(self, directory="jokes"):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.signature = None
+        self.current = None
+
+    def scan(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            # Hidden files are in-progress writes (see sinks.AtomicSink)
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(entries))
+
+    def snapshot(self):
+        signature = self.scan()
+        with self.lock:
+            if signature != self.signature:
+                self.current = self.load(signature)
+                self.signature = signature
+            return self.current
+
+    def load(self, signature):
+        return CorpusSnapshot(self.build(signature))
+
+    def build(self, signature):
+        combined = []
+        for filename, _, _ in signature:
+            file_path = os.path.join(self.directory, filename)
+            with open(file_path, "r", encoding="utf-8") as f:
+                content = f.read()
+            combined.append(f"--- {filename} ---\n{content}\n")
+        log.info("Rebuilt combined corpus from %d files in %s", len(signature), self.directory)
+        return "\n".join(combined).encode("utf-8")
+
+
+def map_file(path):
+    """Read-only mapping of a file (bytes for an empty one, which can't be mapped)"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class SharedCorpus(CombinedCorpus):
+    """CombinedCorpus whose snapshots are files under `snapshot_dir`, memory-mapped by every worker.
+
+    API worker processes map the same body and gzip files, so the corpus sits in the page
+    cache once instead of in each worker's heap. Snapshots are named after the directory
+    signature: the first worker to see new joke files builds and compresses the snapshot,
+    the rest only map it.
+    """
+
+    def __init__(self, directory="jokes", snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+        super().__init__(directory)
+        self.snapshot_dir = snapshot_dir
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+    def paths(self, signature):
+        key = hashlib.sha256(repr((os.path.abspath(self.directory), signature)).encode("utf-8")).hexdigest()[:16]
+        base = os.path.join(self.snapshot_dir, f"corpus-{key}")
+        return f"{base}.txt", f"{base}.txt.gz"
+
+    def load(self, signature):
+        body_path, gzip_path = self.paths(signature)
+        try:
+            return CorpusSnapshot(map_file(body_path), map_file(gzip_path))
+        except FileNotFoundError:
+            pass
+        snapshot = super().load(signature)
+        # Written under unique names and renamed, so a concurrent build by another worker is harmless
+        for path, data in ((gzip_path, snapshot.gzipped), (body_path, snapshot.body)):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        self.remove_stale(body_path, gzip_path)
+        try:
+            return CorpusSnapshot(map_file(body_path), map_file(gzip_path))
+        except FileNotFoundError:
+            # Already replaced by a newer snapshot from another worker; serve this one from memory
+            return snapshot
+
+    def remove_stale(self, *keep):
+        """Delete older snapshots; workers still mapping one keep their mapping"""
+        keep = {os.path.basename(path) for path in keep}
+        for entry in os.scandir(self.snapshot_dir):
+            if entry.name.startswith("corpus-") and entry.name not in keep and not entry.name.endswith(".tmp"):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+def iter_chunks(data, chunk_size=CHUNK_SIZE):
+    """Yield slices of `data` without copying it"""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
@@ -0,0 +1,268 @@
+"""Distributed crawl: the scrapers' work split into leased tasks shared by worker processes.
+
+    python crawl.py run --workers 4          # seed, work with 4 local processes, collect
+    python crawl.py seed                     # or run the steps separately, e.g. one
+    python crawl.py work                     # `work` per process or machine sharing the
+    python crawl.py collect                  # queue database
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+
+import requests
+
+import jokes
+from fingerprints import FingerprintIndex, fingerprint
+from fetchpolicy import FetchPolicy
+from httpcache import ResponseCache
+from logconfig import configure_logging
+from nytimes import NYTimesScraper
+from ratelimit import SharedRateLimiter
+from store import ScraperStore
+from workqueue import DEFAULT_QUEUE_PATH, WorkQueue
+
+JOKES = "jokes"
+ARTICLES = "articles"
+# All stories of one homepage scrape are collected together
+HOMEPAGE = "homepage"
+
+log = logging.getLogger(__name__)
+
+
+def seed_jokes(queue, max_loads=10, cache=None):
+    """One task per category page, queued one after another by the workers (see scrape_joke_page)"""
+    categories = jokes.get_categories(cache=cache)
+    for cat in categories:
+        queue.seed(JOKES, cat["name"], [(0, {"name": cat["name"], "url": cat["url"], "max_loads": max_loads})])
+    log.info("Queued %d categories with up to %d pages each", len(categories), max_loads + 1)
+    return len(categories)
+
+
+def seed_articles(queue, scraper, max_stories=5):
+    """One task per homepage story, fetching its article"""
+    stories = scraper.get_homepage_stories()[:max_stories]
+    scraper.selector_stats.save()
+    queue.seed(ARTICLES, HOMEPAGE, list(enumerate(stories)))
+    log.info("Queued %d stories", len(stories))
+    return len(stories)
+
+
+class CrawlWorker:
+    """Leases tasks from the shared queue until there is nothing left to do.
+
+    All workers share one SharedRateLimiter, so the per-host rate holds across processes.
+    """
+
+    def __init__(self, queue, limiter, queues=(JOKES, ARTICLES), worker_id=None, cache=None, poll=1.0):
+        self.queue = queue
+        self.limiter = limiter
+        self.queues = queues
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.cache = cache
+        self.poll = poll
+        self.session = requests.Session()
+        self.policy = FetchPolicy.from_env()
+        self.scraper = None
+        self.handlers = {JOKES: self.scrape_joke_page, ARTICLES: self.fetch_article}
+
+    def scrape_joke_page(self, task):
+        """Scrape one page of a category, and queue the next unless paging stops here.
+
+        Paging stops where process_category() would: at an empty "Load More" page, a page
+        without jokes the earlier pages didn't have, or after `max_loads`.
+        """
+        load_num = task.seq
+        pages = jokes.fetch_pages(task.payload["url"], self.session, self.limiter, cache=self.cache,
+                                  start_load=load_num, max_loads=load_num, policy=self.policy)
+        page_jokes = next((found for _, found in jokes.parse_pages(pages)), None)
+        if page_jokes is None:
+            return {"jokes": []}
+        if load_num:
+            # Pages are scraped in order, so every earlier page of the category is done
+            seen = {
+                fingerprint(joke_obj["joke"])
+                for seq, status, _, result in self.queue.results(JOKES, task.group)
+                if seq < load_num and status == "done"
+                for joke_obj in result["jokes"]
+            }
+            if not any(joke_obj["joke"] and fingerprint(joke_obj["joke"]) not in seen for joke_obj in page_jokes):
+                return {"jokes": page_jokes}
+        if load_num < task.payload.get("max_loads", 0):
+            task.follow_up = (load_num + 1, task.payload)
+        return {"jokes": page_jokes}
+
+    def fetch_article(self, task):
+        if self.scraper is None:
+            self.scraper = NYTimesScraper(cache=self.cache, policy=self.policy)
+            self.scraper.limiter = self.limiter
+        link = task.payload.get("link")
+        return {"content": self.scraper.get_cached_article(link) if link else None}
+
+    def run_once(self):
+        """Process one task; False when no queue had anything available"""
+        for name in self.queues:
+            task = self.queue.lease(name, self.worker_id)
+            if task is None:
+                continue
+            try:
+                result = self.handlers[name](task)
+            except Exception as e:
+                log.warning("Task %s/%s #%d failed (attempt %d): %s", name, task.group, task.seq, task.attempts, e)
+                self.queue.fail(task, self.worker_id, e)
+            else:
+                if not self.queue.ack(task, self.worker_id, result):
+                    log.warning("Lease on %s/%s #%d expired before it finished", name, task.group, task.seq)
+            return True
+        return False
+
+    def run(self):
+        done = 0
+        while True:
+            if self.run_once():
+                done += 1
+                continue
+            # Leased tasks may still come back if their worker dies, so wait for them to settle
+            if not any(self.queue.outstanding(name) for name in self.queues):
+                break
+            time.sleep(self.poll)
+        log.info("Worker %s finished %d tasks", self.worker_id, done)
+        return done
+
+
+def collect_jokes(queue, index, store=None, skip_cross_category=True):
+    """Write every fully processed category from its pages' results, like process_category()"""
+    total = 0
+    for name in queue.groups(JOKES):
+        if queue.outstanding(JOKES, name):
+            log.info("Category %s still has pages in progress, leaving it for later", name)
+            continue
+        pages = queue.results(JOKES, name)
+        if not pages or pages[0][1] != "done":
+            # Without the category page there is nothing to replace the stored file with
+            log.warning("Category %s could not be fetched, keeping the existing file", name)
+            queue.clear(JOKES, name)
+            continue
+
+        writer = jokes.CategoryWriter(name, index=index, skip_cross_category=skip_cross_category, store=store)
+        seen = set()
+        for load_num, status, _, result in pages:
+            # A failed page ends the category, as a failed fetch does in a single-process crawl
+            if status != "done":
+                break
+            new_jokes = []
+            for joke_obj in result["jokes"]:
+                fp = fingerprint(joke_obj["joke"])
+                if joke_obj["joke"] and fp not in seen:
+                    seen.add(fp)
+                    new_jokes.append(joke_obj)
+            for joke_obj in new_jokes:
+                writer.write(joke_obj)
+            total += len(new_jokes)
+            if load_num and not new_jokes:
+                break
+        writer.commit()
+        queue.clear(JOKES, name)
+    return total
+
+
+def collect_articles(queue, scraper):
+    """Store and deliver the stories of a finished homepage scrape"""
+    if queue.outstanding(ARTICLES, HOMEPAGE):
+        log.info("Articles are still being fetched, leaving them for later")
+        return []
+    stories = []
+    for _, status, story, result in queue.results(ARTICLES, HOMEPAGE):
+        if "link" in story:
+            content = result["content"] if status == "done" else []
+            story["full_content"] = content
+            story["content_length"] = len(content)
+        stories.append(story)
+    if not stories:
+        return []
+
+    stored = scraper.store.upsert_articles(stories)
+    log.info("Stored %d articles in %s", stored, scraper.store.path)
+    deliveries = []
+    for story in stories:
+        queued = scraper.queue_new_story(story)
+        if queued is not None:
+            deliveries.append((story, *queued))
+    sent = scraper.settle_deliveries(deliveries)
+    log.info("Sent %d/%d new or changed stories to API", sent, len(deliveries))
+    queue.clear(ARTICLES, HOMEPAGE)
+    return stories
+
+
+def work(queue_path=DEFAULT_QUEUE_PATH, rate=1.0, queues=(JOKES, ARTICLES), lease_seconds=120):
+    """Worker process entry point"""
+    configure_logging()
+    queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    limiter = SharedRateLimiter(queue_path, rate=rate)
+    return CrawlWorker(queue, limiter, queues=queues, cache=ResponseCache.from_env()).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl with several worker processes sharing a leased work queue")
+    parser.add_argument("command", choices=["seed", "work", "collect", "run"])
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="Queue database shared by all workers")
+    parser.add_argument("--only", choices=[JOKES, ARTICLES], help="Limit to one scraper")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes started by `run`")
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second per host, across all workers")
+    parser.add_argument("--lease", type=float, default=120, help="Seconds before an unfinished task is handed out again")
+    parser.add_argument("--max-loads", type=int, default=10, help="Number of 'load more' pages per category")
+    parser.add_argument("--max-stories", type=int, default=5)
+    parser.add_argument("--keep-cross-category", action="store_true",
+                        help="Keep jokes already stored under another category instead of skipping them")
+    args = parser.parse_args()
+    configure_logging()
+    queues = (args.only,) if args.only else (JOKES, ARTICLES)
+    queue = WorkQueue(args.queue, lease_seconds=args.lease)
+    cache = ResponseCache.from_env()
+
+    scraper = None
+    if ARTICLES in queues and args.command in ("seed", "collect", "run"):
+        scraper = NYTimesScraper(cache=cache)
+        scraper.limiter = SharedRateLimiter(args.queue, rate=args.rate)
+
+    if args.command in ("seed", "run"):
+        if JOKES in queues:
+            seed_jokes(queue, max_loads=args.max_loads, cache=cache)
+        if scraper is not None:
+            seed_articles(queue, scraper, max_stories=args.max_stories)
+
+    if args.command == "work":
+        work(args.queue, rate=args.rate, queues=queues, lease_seconds=args.lease)
+    elif args.command == "run":
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=work, args=(args.queue, args.rate, queues, args.lease))
+            for _ in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    if args.command in ("collect", "run"):
+        if JOKES in queues:
+            index = FingerprintIndex()
+            if not len(index):
+                jokes.index_existing_jokes(index)
+            store = ScraperStore()
+            if not store.category_counts():
+                jokes.store_existing_jokes(store)
+            log.info("Collected %d jokes", collect_jokes(queue, index, store, not args.keep_cross_category))
+        if scraper is not None:
+            collect_articles(queue, scraper)
+            scraper.delivery.close()
+
+    for name in queues:
+        log.info("Queue %s: %s", name, queue.counts(name) or "empty")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+import fcntl
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import socket
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import DELIVERY_SECONDS
+
+DEFAULT_JOURNAL_PATH = os.path.join("data", "delivery_journal.jsonl")
+
+log = logging.getLogger(__name__)
+
+
+class DeliveryJournal:
+    """Append-only JSONL log of payloads waiting for delivery.
+
+    Every payload is written as an `enqueue` record before it is sent and settled by a
+    later `ack` (accepted by the API) or `reject` (refused with a permanent 4xx) record,
+    so anything still pending after a crash or restart can be replayed. A `skip` record
+    settles an entry that replay found no longer needs sending. An enqueue may carry
+    `meta` for the sender's own use, which is kept with it but never posted.
+
+    Several senders, in one process or many, may share a journal. Each enqueue names its
+    owner, and a live owner holds an flock on its file under `<journal>.owners/`. Replay
+    only takes entries whose owner no longer holds that lock, and records a `claim` for
+    them. Appends, claims and compaction all happen under an flock on `<journal>.lock`.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.lock_path = f"{path}.lock"
+        self.owners_dir = f"{path}.owners"
+        self.owner_files = {}
+        os.makedirs(self.owners_dir, exist_ok=True)
+
+    @contextmanager
+    def locked(self):
+        """Exclusive access to the journal across threads and processes"""
+        with self.lock:
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def owner_path(self, owner):
+        return os.path.join(self.owners_dir, f"{owner}.lock")
+
+    def register(self, owner):
+        """Mark `owner` as live until release() or the process exits"""
+        with self.lock:
+            if owner in self.owner_files:
+                return
+            f = open(self.owner_path(owner), "a")
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.owner_files[owner] = f
+
+    def release(self, owner):
+        with self.lock:
+            f = self.owner_files.pop(owner, None)
+        if f is not None:
+            os.remove(self.owner_path(owner))
+            f.close()
+
+    def is_alive(self, owner):
+        """True while some sender holds `owner`'s lock (this process's own senders included)"""
+        if not owner:
+            return False
+        try:
+            f = open(self.owner_path(owner), "r")
+        except FileNotFoundError:
+            return False
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            # A crashed sender's leftover file
+            try:
+                os.remove(self.owner_path(owner))
+            except FileNotFoundError:
+                pass
+            return False
+
+    def _write(self, records):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, op, item_id, payload=None, owner=None, meta=None):
+        record = {"op": op, "id": item_id, "ts": time.time()}
+        if payload is not None:
+            record["payload"] = payload
+        if owner is not None:
+            record["owner"] = owner
+        if meta is not None:
+            record["meta"] = meta
+        with self.locked():
+            self._write([record])
+
+    def pending(self):
+        """(id, payload, owner) for entries that were enqueued but never settled, in their original order"""
+        with self.locked():
+            return [(record["id"], record["payload"], record.get("owner")) for record in self._pending()]
+
+    def _pending(self):
+        """Unsettled enqueue records, with the owner of their latest claim"""
+        pending = {}
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from a crash mid-write
+                if record["op"] == "enqueue":
+                    pending[record["id"]] = record
+                elif record["op"] == "claim":
+                    if record["id"] in pending:
+                        pending[record["id"]]["owner"] = record["owner"]
+                else:
+                    pending.pop(record["id"], None)
+        return list(pending.values())
+
+    def pending_meta(self):
+        """`meta` of every unsettled entry that has one, whoever owns it"""
+        with self.locked():
+            return [record["meta"] for record in self._pending() if record.get("meta") is not None]
+
+    def claim_orphans(self, owner, in_flight=None):
+        """Take over the unsettled entries of senders that are gone; returns their (id, payload, meta).
+
+        With `in_flight`, the ids `owner` is still sending, its other unsettled entries (the
+        ones it gave up on) are returned as well.
+        """
+        with self.locked():
+            orphans, own = [], []
+            for record in self._pending():
+                entry = (record["id"], record["payload"], record.get("meta"))
+                current = record.get("owner")
+                if current == owner:
+                    if in_flight is not None and record["id"] not in in_flight:
+                        own.append(entry)
+                elif not self.is_alive(current):
+                    orphans.append(entry)
+            if orphans:
+                now = time.time()
+                self._write([{"op": "claim", "id": item_id, "owner": owner, "ts": now} for item_id, _, _ in orphans])
+        return orphans + own
+
+    def compact(self):
+        """Rewrite the journal with only the unsettled payloads"""
+        # Unique name, so a compaction in another process can't write into the same file
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self.locked():
+            pending = self._pending()
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in pending:
+                    record.pop("ts", None)
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+
+
+class StoryDelivery:
+    """Background sender for story payloads.
+
+    Payloads are journaled, then posted by a worker thread over a pooled keep-alive
+    session. With `batch_url` set, up to `batch_size` payloads are posted together as a
+    JSON list. Failed sends are retried with exponential backoff and jitter; payloads that
+    still fail stay in the journal and are replayed by the next sender to start once this
+    one is closed or its process has exited.
+
+    `on_ack(meta)` is called from the sender thread for every accepted payload that was
+    submitted with `meta`, replayed ones included. Before an entry is replayed,
+    `should_send(meta)` may drop it, e.g. because it was delivered some other way since.
+    """
+
+    def __init__(self, api_url, journal_path=DEFAULT_JOURNAL_PATH, batch_url=None, batch_size=20,
+                 max_attempts=5, backoff=1.0, max_backoff=30.0, pool_size=4, timeout=10, on_ack=None,
+                 should_send=None):
+        self.api_url = api_url
+        self.batch_url = batch_url
+        self.batch_size = batch_size if batch_url else 1
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.on_ack = on_ack
+        self.should_send = should_send
+        self.journal = DeliveryJournal(journal_path)
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'User-Agent': 'NYTimesScraper/1.0'
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.queue = queue.Queue()
+        self.futures = {}
+        self.meta = {}
+        # Keys of the meta of entries the journal still holds, see is_pending()
+        self.pending_keys = set()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def meta_key(meta):
+        return json.dumps(meta, sort_keys=True)
+
+    def start(self):
+        """Start the sender thread, replaying what senders that are gone left pending.
+
+        Returns how many entries were replayed, or None if the sender was already running.
+        """
+        with self.lock:
+            if self.thread is not None:
+                return None
+            self.journal.register(self.owner)
+            self.thread = threading.Thread(target=self._run, name="story-delivery", daemon=True)
+            self.thread.start()
+        return self.replay()
+
+    def retry_pending(self):
+        """Queue again what this sender gave up on, and what senders that have gone since left.
+
+        A long-lived sender (the API's) calls this before each run, since start() only
+        replays once. Returns how many entries were queued.
+        """
+        replayed = self.start()
+        if replayed is not None:
+            return replayed
+        return self.replay()
+
+    def replay(self):
+        """Queue the orphaned and given-up entries of the journal, dropping those should_send() refuses"""
+        with self.lock:
+            # Copied in one step: the sender thread pops entries as it settles them
+            in_flight = self.futures.copy()
+            claimed = self.journal.claim_orphans(self.owner, in_flight=in_flight)
+            replayed = 0
+            for item_id, payload, meta in claimed:
+                if meta is not None and self.should_send is not None and not self.should_send(meta):
+                    self.journal.append("skip", item_id)
+                    continue
+                self._enqueue(item_id, payload, meta)
+                replayed += 1
+            # Including what live senders elsewhere are still working on
+            self.pending_keys.update(self.meta_key(meta) for meta in self.journal.pending_meta())
+        if claimed:
+            log.info("Replaying %d undelivered stories from %s (%d no longer needed)",
+                     replayed, self.journal.path, len(claimed) - replayed)
+        return replayed
+
+    def _enqueue(self, item_id, payload, meta):
+        self.futures[item_id] = future = Future()
+        if meta is not None:
+            self.meta[item_id] = meta
+            self.pending_keys.add(self.meta_key(meta))
+        self.queue.put((item_id, payload))
+        return future
+
+    def submit(self, payload, meta=None):
+        """Journal a payload and queue it; the returned Future resolves to True once accepted"""
+        self.start()
+        item_id = uuid.uuid4().hex
+        with self.lock:
+            self.journal.append("enqueue", item_id, payload, owner=self.owner, meta=meta)
+            return self._enqueue(item_id, payload, meta)
+
+    def is_pending(self, meta):
+        """True if an entry with this `meta` is still in the journal, queued here or by another sender.
+
+        Starts the sender, so that entries left by senders that are gone count as well.
+        """
+        self.start()
+        with self.lock:
+            return self.meta_key(meta) in self.pending_keys
+
+    def flush(self):
+        """Block until everything queued so far has been delivered or given up on"""
+        self.queue.join()
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        self.journal.compact()
+        self.session.close()
+        # Anything this sender gave up on becomes replayable by the next one
+        self.journal.release(self.owner)
+
+    def post(self, payloads):
+        """Send payloads once; returns the HTTP status code"""
+        start = time.perf_counter()
+        try:
+            if len(payloads) > 1 or self.batch_url:
+                response = self.session.post(self.batch_url, json=payloads, timeout=self.timeout)
+            else:
+                response = self.session.post(self.api_url, json=payloads[0], timeout=self.timeout)
+        except requests.RequestException:
+            DELIVERY_SECONDS.observe(time.perf_counter() - start, outcome="error")
+            raise
+        ok = 200 <= response.status_code < 300
+        DELIVERY_SECONDS.observe(time.perf_counter() - start, outcome="ok" if ok else str(response.status_code))
+        if not ok:
+            log.warning("✗ API error %d: %s", response.status_code, response.text[:200])
+        return response.status_code
+
+    def _next_batch(self):
+        item = self.queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the stop marker back so the loop exits after this batch
+                self.queue.task_done()
+                self.queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _settle(self, batch, op, delivered):
+        for item_id, _ in batch:
+            self.journal.append(op, item_id)
+            meta = self.meta.pop(item_id, None)
+            if meta is not None:
+                if delivered and self.on_ack is not None:
+                    try:
+                        self.on_ack(meta)
+                    except Exception:
+                        log.exception("on_ack failed for %s", meta)
+                with self.lock:
+                    self.pending_keys.discard(self.meta_key(meta))
+            future = self.futures.pop(item_id, None)
+            if future is not None:
+                future.set_result(delivered)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                self.queue.task_done()
+                return
+            payloads = [payload for _, payload in batch]
+            outcome = None
+            for attempt in range(self.max_attempts):
+                try:
+                    status = self.post(payloads)
+                except requests.RequestException as e:
+                    log.warning("✗ Failed to send %d stories to API: %s", len(batch), e)
+                    status = None
+                if status is not None and 200 <= status < 300:
+                    outcome = "ack"
+                    break
+                if status is not None and 400 <= status < 500 and status not in (408, 429):
+                    outcome = "reject"
+                    break
+                if attempt < self.max_attempts - 1:
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                    time.sleep(random.uniform(delay / 2, delay))
+
+            if outcome:
+                self._settle(batch, outcome, outcome == "ack")
+            else:
+                # Left pending in the journal; the next start() replays it
+                log.error("✗ Giving up on %d stories for now, they stay in %s", len(batch), self.journal.path)
+                for item_id, _ in batch:
+                    self.meta.pop(item_id, None)
+                    future = self.futures.pop(item_id, None)
+                    if future is not None:
+                        future.set_result(False)
+            for _ in batch:
+                self.queue.task_done()
@@ -0,0 +1,226 @@
+import re
+
+import soupsieve
+from bs4 import Tag
+
+DEFAULT_AD_PHRASES = (
+    "subscribe", "subscription", "advertisement",
+    "support our journalism", "times access",
+    "play these games", "connections", "spelling bee",
+    "crossword", "newsletter", "sign up", "log in",
+    "create account", "paywall", "digital subscription",
+)
+
+# tag, then any number of .class and [attr], [attr="v"], [attr*="v"], [attr^="v"], [attr$="v"] parts
+_COMPOUND = re.compile(r"^(?P<tag>[a-zA-Z][\w-]*)?(?P<parts>(?:\.[\w-]+|\[[\w-]+(?:[*^$]?=\"[^\"]*\")?\])*)$")
+_PART = re.compile(r"\.(?P<cls>[\w-]+)|\[(?P<attr>[\w-]+)(?:(?P<op>[*^$]?=)\"(?P<value>[^\"]*)\")?\]")
+
+
+def trie_pattern(phrases):
+    """Regex source matching any of `phrases`, factored into a prefix trie.
+
+    Alternatives sharing a prefix are tried together, so each position in the text costs
+    about one character comparison instead of one per phrase.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class AdFilter:
+    """Every ad phrase folded into one precompiled regex, so a paragraph is scanned once"""
+
+    def __init__(self, phrases=DEFAULT_AD_PHRASES):
+        self.phrases = tuple(phrases)
+        # Same test as `phrase in text.lower()` for each phrase, but in a single search
+        alternatives = {phrase.lower() for phrase in self.phrases if phrase}
+        self.pattern = re.compile(trie_pattern(alternatives)) if alternatives else None
+
+    def __call__(self, text):
+        return self.pattern is not None and self.pattern.search(text.lower()) is not None
+
+
+def _attribute_text(tag, name):
+    value = tag.get(name)
+    if isinstance(value, list):
+        return " ".join(value)
+    return value
+
+
+def parse_selector(selector):
+    """(tag, classes, [(attr, op, value)]) for a simple compound selector, or None if it is more complex"""
+    match = _COMPOUND.match(selector.strip())
+    if not match:
+        return None
+    name = match.group("tag")
+    classes, attrs = [], []
+    for part in _PART.finditer(match.group("parts")):
+        if part.group("cls"):
+            classes.append(part.group("cls"))
+        else:
+            attrs.append((part.group("attr").lower(), part.group("op"), part.group("value")))
+    return (name.lower() if name else None), classes, attrs
+
+
+def _attribute_check(attr, op, value):
+    if op is None:
+        return lambda tag: attr in tag.attrs
+    if op != "=" and not value:
+        # Empty substring/prefix/suffix matches never match, per the CSS spec
+        return lambda tag: False
+    if op == "=":
+        return lambda tag: _attribute_text(tag, attr) == value
+    if op == "*=":
+        return lambda tag: value in (_attribute_text(tag, attr) or "")
+    if op == "^=":
+        return lambda tag: (_attribute_text(tag, attr) or "").startswith(value)
+    return lambda tag: (_attribute_text(tag, attr) or "").endswith(value)
+
+
+def compile_check(name, classes, attrs, indexed):
+    """Predicate for the parts of a selector not already guaranteed by how it was looked up (None: always true)"""
+    checks = []
+    if name is not None and indexed != "name":
+        checks.append(lambda tag: tag.name == name)
+    rest = classes[1:] if indexed == "class" else classes
+    if rest:
+        checks.append(lambda tag: all(cls in (tag.get("class") or ()) for cls in rest))
+    checks.extend(_attribute_check(attr, op, value) for attr, op, value in attrs)
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda tag: all(check(tag) for check in checks)
+
+
+class SelectorSet:
+    """Matches an element against many selectors at once, returning a bitmask of the ones that match.
+
+    Simple selectors are indexed by a class, tag name or attribute they require, so an
+    element is only checked against selectors that could match it. Anything else is
+    handed to soupsieve.
+    """
+
+    def __init__(self, selectors):
+        self.by_class, self.by_name, self.by_attr, self.other = {}, {}, {}, []
+        for bit, selector in enumerate(selectors):
+            parsed = parse_selector(selector)
+            if parsed is None:
+                self.other.append((1 << bit, soupsieve.compile(selector).match))
+                continue
+            name, classes, attrs = parsed
+            if classes:
+                self.by_class.setdefault(classes[0], []).append((1 << bit, compile_check(*parsed, "class")))
+            elif name:
+                self.by_name.setdefault(name, []).append((1 << bit, compile_check(*parsed, "name")))
+            elif attrs:
+                self.by_attr.setdefault(attrs[0][0], []).append((1 << bit, compile_check(*parsed, "attr")))
+            else:
+                self.other.append((1 << bit, lambda tag: True))
+
+    def match(self, tag):
+        mask = 0
+        attrs = tag.attrs
+        if attrs:
+            classes = attrs.get("class")
+            if classes and self.by_class:
+                for cls in classes:
+                    for bit, check in self.by_class.get(cls, ()):
+                        if check is None or check(tag):
+                            mask |= bit
+            for attr, checks in self.by_attr.items():
+                if attr in attrs:
+                    for bit, check in checks:
+                        if check is None or check(tag):
+                            mask |= bit
+        for bit, check in self.by_name.get(tag.name, ()):
+            if check is None or check(tag):
+                mask |= bit
+        for bit, predicate in self.other:
+            if predicate(tag):
+                mask |= bit
+        return mask
+
+
+class ArticleExtractor:
+    """Finds article paragraphs in one walk over the parsed tree.
+
+    Produces the same paragraphs as selecting each container selector in turn and taking
+    the `<p>` elements inside its matches. During the walk every container selector is
+    scored by how many of its paragraphs pass the filters, and the first selector (in
+    priority order) with a non-zero score wins. Without a winner, every paragraph in the
+    document is considered against the stricter `broad_min_length`.
+    """
+
+    def __init__(self, selectors, ad_filter=None, min_length=50, broad_min_length=100):
+        self.selectors = list(selectors)
+        self.selector_set = SelectorSet(self.selectors)
+        self.ad_filter = ad_filter or AdFilter()
+        self.min_length = min_length
+        self.broad_min_length = broad_min_length
+
+    def paragraphs(self, soup):
+        """Each <p> in document order, with a bitmask of the selectors matching one of its ancestors"""
+        match = self.selector_set.match
+        paragraphs = []
+        # Pre-order walk with an explicit stack, so deeply nested pages can't hit the recursion limit
+        stack = [(iter(soup.contents), 0)]
+        while stack:
+            children, inherited = stack[-1]
+            for child in children:
+                if isinstance(child, Tag):
+                    if child.name == "p":
+                        paragraphs.append((child, inherited))
+                    if child.contents:
+                        stack.append((iter(child.contents), inherited | match(child)))
+                        break
+            else:
+                stack.pop()
+        return paragraphs
+
+    def extract(self, soup, broad_search=True):
+        """(paragraph texts, winning selector or None)"""
+        count = len(self.selectors)
+        paragraphs = self.paragraphs(soup)
+        texts = {}
+
+        def text_of(p):
+            key = id(p)
+            if key not in texts:
+                texts[key] = p.get_text(strip=True)
+            return texts[key]
+
+        scores = [[] for _ in range(count)]
+        for p, mask in paragraphs:
+            if not mask:
+                continue
+            text = text_of(p)
+            if len(text) <= self.min_length or self.ad_filter(text):
+                continue
+            for bit in range(count):
+                if mask & (1 << bit):
+                    scores[bit].append(text)
+        for bit, content in enumerate(scores):
+            if content:
+                return content, self.selectors[bit]
+
+        if not broad_search:
+            return [], None
+        content = []
+        for p, _ in paragraphs:
+            text = text_of(p)
+            if len(text) > self.broad_min_length and not self.ad_filter(text):
+                content.append(text)
+        return content, None
@@ -0,0 +1,186 @@
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from httpcache import fetch
+from metrics import CIRCUIT_OPENED, CIRCUIT_REJECTED, FETCH_RETRIES
+
+# Throttling and transient server errors; any other status is returned to the caller as is
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Statuses that count against a host's circuit breaker without being retried
+REFUSAL_STATUSES = (403,)
+
+log = logging.getLogger(__name__)
+
+
+class CircuitOpen(requests.RequestException):
+    """Raised instead of sending a request to a host whose circuit breaker is open"""
+
+
+def retry_after(response):
+    """Seconds to wait according to a Retry-After header (delta-seconds or HTTP date), or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    """Per-host breaker: after `failure_threshold` consecutive failures the host is left alone.
+
+    Once `reset_timeout` seconds have passed a single probe request is let through; it
+    closes the circuit on success and opens it again on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # host -> [consecutive failures, monotonic time the circuit stays open until, probing]
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def allow(self, host):
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None or state[1] is None:
+                return True
+            now = time.monotonic()
+            if now < state[1] or state[2]:
+                return False
+            # Half-open: this caller probes, everyone else waits for its outcome
+            state[2] = True
+            return True
+
+    def success(self, host):
+        with self.lock:
+            self.hosts.pop(host, None)
+
+    def failure(self, host):
+        with self.lock:
+            state = self.hosts.setdefault(host, [0, None, False])
+            state[0] += 1
+            if state[2] or state[0] >= self.failure_threshold:
+                self.open(host, self.reset_timeout)
+
+    def cancel(self, host):
+        """Give up a half-open probe that ended without an outcome, so the next caller probes"""
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is not None:
+                state[2] = False
+
+    def trip(self, host, seconds):
+        """Open the circuit for at least `seconds`, e.g. when the host asks for a long Retry-After"""
+        with self.lock:
+            self.hosts.setdefault(host, [0, None, False])
+            self.open(host, seconds)
+
+    def open(self, host, seconds):
+        state = self.hosts[host]
+        now = time.monotonic()
+        already_open = state[1] is not None and not state[2] and now < state[1]
+        state[1] = max(state[1], now + seconds) if already_open else now + seconds
+        state[2] = False
+        if not already_open:
+            CIRCUIT_OPENED.inc(host=host)
+            log.warning("Circuit open for %s for %.0fs after %d failures", host, seconds, state[0])
+
+
+class FetchPolicy:
+    """Retries, backoff and circuit breaking shared by the scrapers' GETs.
+
+    A request that succeeds costs nothing beyond the rate limit. Connection errors and
+    RETRY_STATUSES are retried after an exponential backoff with full jitter, or after the
+    server's Retry-After when it sends one. Retry-After values above `max_delay` aren't
+    waited for: the host's circuit is opened for that long and the response returned.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=30.0, breaker=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_attempts=int(os.getenv("FETCH_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("FETCH_BACKOFF_BASE", "0.5")),
+            max_delay=float(os.getenv("FETCH_BACKOFF_MAX", "30")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("FETCH_CIRCUIT_FAILURES", "5")),
+                reset_timeout=float(os.getenv("FETCH_CIRCUIT_RESET", "60")),
+            ),
+        )
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number `attempt` (starting at 1)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def get(self, session, url, cache=None, limiter=None, **kwargs):
+        """fetch() with retries; raises CircuitOpen, or the last RequestException once attempts run out"""
+        if cache is not None and cache.offline:
+            # Replaying recorded pages: nothing to wait for and nothing that a retry would change
+            return fetch(session, url, cache=cache, **kwargs)
+
+        host = urlparse(url).netloc or url
+        for attempt in range(1, self.max_attempts + 1):
+            if not self.breaker.allow(host):
+                CIRCUIT_REJECTED.inc(host=host)
+                raise CircuitOpen(f"Circuit open for {host}, not requesting {url}")
+            last = attempt == self.max_attempts
+            try:
+                if limiter is not None:
+                    limiter.acquire(url)
+                response = fetch(session, url, cache=cache, **kwargs)
+            except requests.RequestException as e:
+                self.breaker.failure(host)
+                if last:
+                    raise
+                delay = self.backoff(attempt)
+                log.info("Request error for %s (attempt %d), retrying in %.1fs: %s", url, attempt, delay, e)
+                FETCH_RETRIES.inc(reason="error")
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Not the host's doing (cache I/O, decoding, an interrupt), but if this call was
+                # the half-open probe, the host must not stay blocked waiting for its outcome
+                self.breaker.cancel(host)
+                raise
+
+            status = response.status_code
+            if status in REFUSAL_STATUSES:
+                self.breaker.failure(host)
+                return response
+            if status not in RETRY_STATUSES:
+                self.breaker.success(host)
+                return response
+
+            self.breaker.failure(host)
+            wait = retry_after(response)
+            if wait is not None and wait > self.max_delay:
+                log.warning("%s asked to wait %.0fs (Retry-After), backing off from the host", host, wait)
+                self.breaker.trip(host, wait)
+                return response
+            if last:
+                return response
+            delay = wait if wait is not None else self.backoff(attempt)
+            log.info("Status %d for %s (attempt %d), retrying in %.1fs", status, url, attempt, delay)
+            FETCH_RETRIES.inc(reason="throttled" if status == 429 or wait is not None else "server_error")
+            response.close()
+            time.sleep(delay)
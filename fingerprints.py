@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+
+DEFAULT_INDEX_PATH = os.path.join("data", "fingerprints.json")
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+log = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Lowercase, fold unicode compatibility forms and collapse punctuation/whitespace"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def fingerprint(text):
+    """Short stable hash of the normalized text"""
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class FingerprintIndex:
+    """Persistent map of joke fingerprint -> categories whose files contain that joke"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Could not read fingerprint index %s: %s", self.path, e)
+            self.entries = {}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, fp):
+        return fp in self.entries
+
+    def categories(self, fp):
+        return list(self.entries.get(fp, ()))
+
+    def release(self, category_name):
+        """Forget a category's entries before its file is rewritten"""
+        with self.lock:
+            for fp in [fp for fp, cats in self.entries.items() if category_name in cats]:
+                self.entries[fp].remove(category_name)
+                if not self.entries[fp]:
+                    del self.entries[fp]
+
+    def add(self, category_name, fp, skip_cross_category=True):
+        """Record that a category stores a joke; returns False if it should be skipped instead.
+
+        Jokes already stored under another category are refused when `skip_cross_category`
+        is set, otherwise they are kept and the index records both categories.
+        """
+        with self.lock:
+            cats = self.entries.setdefault(fp, [])
+            if category_name in cats:
+                return False
+            if cats and skip_cross_category:
+                return False
+            cats.append(category_name)
+            return True
+
+    def claim(self, category_name, jokes, skip_cross_category=True):
+        """Replace a category's entries and return the jokes that should be written to its file"""
+        self.release(category_name)
+        return [
+            joke_obj for joke_obj in jokes
+            if self.add(category_name, fingerprint(joke_obj["joke"]), skip_cross_category)
+        ]
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from metrics import CACHE_RESULTS, DOWNLOADED_BYTES, REQUEST_SECONDS
+
+DEFAULT_CACHE_DIR = os.path.join("data", "http_cache")
+# Only headers that still describe the decoded body are kept with a cached response
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Date")
+
+
+class OfflineCacheMiss(requests.RequestException):
+    """Raised in offline mode when a URL has never been recorded"""
+
+
+class ResponseCache:
+    """On-disk GET response cache shared by the scrapers.
+
+    Responses are stored per URL as a JSON metadata file plus the raw body. Entries younger
+    than `ttl` seconds are served without touching the network; older ones are revalidated
+    with If-None-Match / If-Modified-Since so unchanged pages come back as 304s. Entries not
+    used for `max_age` seconds are evicted, and the least recently used ones are dropped once
+    the bodies exceed `max_bytes`. In `offline` mode only recorded responses are served.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=0, max_age=7 * 24 * 3600,
+                 max_bytes=256 * 1024 * 1024, offline=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.total_bytes = None
+        self.last_scan = 0.0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from SCRAPER_HTTP_CACHE=on|offline (anything else disables caching)"""
+        mode = os.getenv("SCRAPER_HTTP_CACHE", "off").lower()
+        if mode not in ("on", "offline"):
+            return None
+        return cls(
+            directory=os.getenv("SCRAPER_HTTP_CACHE_DIR", DEFAULT_CACHE_DIR),
+            ttl=float(os.getenv("SCRAPER_HTTP_CACHE_TTL", "0")),
+            offline=mode == "offline",
+        )
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return f"{base}.json", f"{base}.body"
+
+    def lookup(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        # The body's mtime doubles as the last-used time for LRU eviction
+        os.utime(body_path)
+        return meta, body
+
+    def store(self, url, response):
+        meta_path, body_path = self._paths(url)
+        meta = {
+            "url": url,
+            "status": response.status_code,
+            "headers": {k: response.headers[k] for k in STORED_HEADERS if k in response.headers},
+            "stored_at": time.time(),
+        }
+        body = response.content
+        with self.lock:
+            previous = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            self._write(body_path, body, "wb")
+            self._write(meta_path, json.dumps(meta), "w")
+            if self.total_bytes is not None:
+                self.total_bytes += len(body) - previous
+        self.evict()
+
+    def touch(self, url, meta):
+        meta["stored_at"] = time.time()
+        meta_path, _ = self._paths(url)
+        with self.lock:
+            self._write(meta_path, json.dumps(meta), "w")
+
+    @staticmethod
+    def _write(path, data, mode):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under `max_bytes`"""
+        now = time.time()
+        with self.lock:
+            under_limit = self.total_bytes is not None and self.total_bytes <= self.max_bytes
+            if under_limit and now - self.last_scan < 3600:
+                return
+            self.last_scan = now
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".body"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for used_at, size, path in entries:
+                if total <= self.max_bytes and now - used_at <= self.max_age:
+                    continue
+                for stale in (path, path[:-len(".body")] + ".json"):
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+                total -= size
+            self.total_bytes = total
+
+    def get(self, session, url, **kwargs):
+        """GET `url` through `session`, serving or revalidating a cached copy when possible"""
+        meta, body = self.lookup(url)
+        if self.offline:
+            if meta is None:
+                raise OfflineCacheMiss(f"No cached response for {url}")
+            self.hits += 1
+            CACHE_RESULTS.inc(result="hit")
+            return build_response(url, meta, body)
+
+        if meta is not None and time.time() - meta["stored_at"] < self.ttl:
+            self.hits += 1
+            CACHE_RESULTS.inc(result="hit")
+            return build_response(url, meta, body)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if meta is not None:
+            etag = meta["headers"].get("ETag")
+            last_modified = meta["headers"].get("Last-Modified")
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = session.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and meta is not None:
+            self.revalidated += 1
+            CACHE_RESULTS.inc(result="revalidated")
+            self.touch(url, meta)
+            return build_response(url, meta, body)
+
+        self.misses += 1
+        CACHE_RESULTS.inc(result="miss")
+        if response.status_code == 200:
+            self.store(url, response)
+        return response
+
+
+def build_response(url, meta, body):
+    response = requests.Response()
+    response.status_code = meta["status"]
+    response.headers = CaseInsensitiveDict(meta["headers"])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response._content = body
+    response.from_cache = True
+    return response
+
+
+def fetch(session, url, cache=None, **kwargs):
+    """Single entry point for scraper GETs so caching and metrics apply to every request"""
+    host = urlparse(url).netloc
+    start = time.perf_counter()
+    if cache is None:
+        response = session.get(url, **kwargs)
+    else:
+        response = cache.get(session, url, **kwargs)
+    from_cache = getattr(response, "from_cache", False)
+    REQUEST_SECONDS.observe(time.perf_counter() - start, host=host, source="cache" if from_cache else "network")
+    if not from_cache:
+        DOWNLOADED_BYTES.inc(len(response.content), host=host)
+    return response
@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class Job:
+    """One background run of a blocking function"""
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs blocking work off the event loop and coalesces identical concurrent requests.
+
+    Jobs submitted with the same key while an earlier one is still queued or running share
+    that job instead of starting another. The most recent `keep` jobs are remembered so
+    their status and results can be polled.
+    """
+
+    def __init__(self, max_workers=2, keep=100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.keep = keep
+        self.jobs = OrderedDict()
+        self.active = {}
+        self.lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Start `fn(*args, **kwargs)` in the background; returns (job, created)"""
+        with self.lock:
+            job_id = self.active.get(key)
+            if job_id is not None:
+                return self.jobs[job_id], False
+            job = Job(key)
+            self.jobs[job.id] = job
+            self.active[key] = job.id
+            self._prune()
+        self.executor.submit(self._run, job, fn, args, kwargs)
+        return job, True
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = "succeeded"
+        except Exception as e:
+            log.exception("Job %s (%s) failed: %s", job.id, job.key, e)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self.lock:
+                if self.active.get(job.key) == job.id:
+                    del self.active[job.key]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(self.jobs) - self.keep)]:
+            del self.jobs[job_id]
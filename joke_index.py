@@ -0,0 +1,189 @@
+import hashlib
+import mmap
+import os
+import random
+import re
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+
+from sinks import RECORD_HEADER, parse_record
+
+DEFAULT_INDEX_DIR = os.path.join("data", "joke_index")
+
+# RECORD_HEADER, found anywhere in the bytes of a file
+RECORD_HEADERS = re.compile(RECORD_HEADER.pattern.encode("ascii"), re.MULTILINE)
+# Sidecar layout: magic, source mtime_ns, source size, record count, then count + 1 uint64 offsets
+SIDECAR_HEADER = struct.Struct("<8sqqq")
+SIDECAR_MAGIC = b"JOKEIDX1"
+OFFSET_SIZE = array("Q").itemsize
+
+
+def build_offsets(data):
+    """Byte offsets of every record header in a save_jokes() file, plus the end of the file"""
+    offsets = array("Q", (m.start() for m in RECORD_HEADERS.finditer(data)))
+    offsets.append(len(data))
+    return offsets
+
+
+def read_record(category, raw):
+    # Same newline translation as reading the file in text mode, as jokes.iter_jokes() does
+    text = raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    header, _, rest = text.partition("\n")
+    user_line, _, body = rest.partition("\n")
+    number = int(RECORD_HEADER.match(header).group(1))
+    joke_obj = parse_record(user_line, body)
+    return {
+        "id": f"{category}:{number}",
+        "category": category,
+        "number": number,
+        "username": joke_obj["username"],
+        "joke": joke_obj["joke"],
+    }
+
+
+class CategoryIndex:
+    """Random access to the records of one category file through a memory-mapped offset table"""
+
+    def __init__(self, category, source_path, index_path):
+        self.category = category
+        self.source_path = source_path
+        self.index_path = index_path
+        stat = os.stat(source_path)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self.data = self._map(source_path, stat.st_size)
+        self.offsets = self._load_offsets() or self._build_offsets()
+
+    @staticmethod
+    def _map(path, size):
+        if size == 0:
+            return b""
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load_offsets(self):
+        """Offset table mapped from the sidecar, so worker processes share one copy of it"""
+        try:
+            with open(self.index_path, "rb") as f:
+                header = f.read(SIDECAR_HEADER.size)
+                if len(header) != SIDECAR_HEADER.size:
+                    return None
+                magic, mtime_ns, size, count = SIDECAR_HEADER.unpack(header)
+                if magic != SIDECAR_MAGIC or (mtime_ns, size) != self.signature:
+                    return None
+                end = SIDECAR_HEADER.size + (count + 1) * OFFSET_SIZE
+                if os.fstat(f.fileno()).st_size < end:
+                    return None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(mapped)[SIDECAR_HEADER.size:end].cast("Q")
+        except (OSError, ValueError):
+            return None
+
+    def _build_offsets(self):
+        offsets = build_offsets(self.data)
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        # Unique per process and thread, since several API workers may build the same sidecar
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SIDECAR_HEADER.pack(SIDECAR_MAGIC, *self.signature, len(offsets) - 1))
+            offsets.tofile(f)
+        os.replace(tmp_path, self.index_path)
+        return self._load_offsets() or offsets
+
+    def is_stale(self):
+        try:
+            stat = os.stat(self.source_path)
+        except OSError:
+            return True
+        return (stat.st_mtime_ns, stat.st_size) != self.signature
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, position):
+        """Record at a 0-based position in file order"""
+        return read_record(self.category, self.data[self.offsets[position]:self.offsets[position + 1]])
+
+    def page(self, page, per_page):
+        start = (page - 1) * per_page
+        return [self.get(i) for i in range(start, min(start + per_page, len(self)))]
+
+
+class JokeIndex:
+    """Indexed, read-only view of the jokes/ directory.
+
+    Each category file gets a sidecar of record offsets (rebuilt when the file's mtime or
+    size changes), so paging, lookups by id and random picks read only the records they
+    return instead of the whole corpus.
+
+    Files without a single record (such as an empty joke_of_the_day.txt) are not
+    categories, and neither are the names in `reserved`, which the API uses for its own
+    routes under /jokes/.
+    """
+
+    def __init__(self, jokes_dir="jokes", index_dir=DEFAULT_INDEX_DIR, reserved=()):
+        self.jokes_dir = jokes_dir
+        self.index_dir = index_dir
+        self.reserved = frozenset(reserved)
+        self.lock = threading.Lock()
+        self.indexes = {}
+
+    def category(self, category):
+        """Index for a category, or None if there is no such category"""
+        if category in self.reserved:
+            return None
+        source_path = os.path.join(self.jokes_dir, f"{category}.txt")
+        with self.lock:
+            index = self.indexes.get(category)
+            if index is None or index.is_stale():
+                if not os.path.isfile(source_path):
+                    self.indexes.pop(category, None)
+                    return None
+                index = CategoryIndex(category, source_path, os.path.join(self.index_dir, f"{category}.idx"))
+                self.indexes[category] = index
+            return index if len(index) else None
+
+    def categories(self):
+        """Joke count per category"""
+        counts = {}
+        for filename in sorted(os.listdir(self.jokes_dir)):
+            if filename.endswith(".txt"):
+                category = filename[:-len(".txt")]
+                index = self.category(category)
+                if index is not None:
+                    counts[category] = len(index)
+        return counts
+
+    def get(self, category, number):
+        """Joke by its `[CATEGORY #number]` number"""
+        index = self.category(category)
+        if index is None or not 1 <= number <= len(index):
+            return None
+        joke = index.get(number - 1)
+        # save_jokes() numbers records sequentially, so position and number normally agree
+        return joke if joke["number"] == number else None
+
+    def nth(self, n):
+        """The n-th joke across all categories in name order"""
+        counts = list(self.categories().items())
+        if not counts:
+            return None
+        bounds = []
+        total = 0
+        for _, count in counts:
+            total += count
+            bounds.append(total)
+        n %= total
+        slot = bisect_right(bounds, n)
+        start = bounds[slot - 1] if slot else 0
+        return self.category(counts[slot][0]).get(n - start)
+
+    def random(self):
+        total = sum(self.categories().values())
+        return self.nth(random.randrange(total)) if total else None
+
+    def joke_of_the_day(self, day):
+        """Same joke for everyone on a given date"""
+        seed = hashlib.sha256(day.isoformat().encode("ascii")).digest()
+        return self.nth(int.from_bytes(seed[:8], "big"))
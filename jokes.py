@@ -1,38 +1,59 @@
 import os
-import time
+import logging
+import argparse
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse
+from ratelimit import HostRateLimiter
+from fingerprints import FingerprintIndex, fingerprint
+from neardup import DEFAULT_THRESHOLD, NearDuplicateIndex
+from checkpoints import KNOWN_FINGERPRINTS, CategoryCheckpoint
+from sinks import RECORD_HEADER, NDJSONSink, TextSink, parse_record, read_ndjson
+from httpcache import ResponseCache
+from fetchpolicy import FetchPolicy
+from store import ScraperStore
+from parsing import CATEGORY_NAV, JOKE_BLOCKS, make_soup, print_parse_stats
+from metrics import EXTRACT_SECONDS, ITEMS_SCRAPED
+from logconfig import configure_logging
+from profiling import profile_run, stage
 
-BASE_URL = "https://www.laughfactory.com/jokes"
+# Overridable so the scraper can be pointed at a local stand-in (see benchserver.py)
+SITE_URL = os.getenv("LAUGHFACTORY_URL", "https://www.laughfactory.com").rstrip("/")
+BASE_URL = f"{SITE_URL}/jokes"
 OUTPUT_DIR = "jokes"
+NDJSON_DIR = os.path.join("data", "jokes")
 
-def get_categories():
-    print("Fetching joke categories...")
+log = logging.getLogger(__name__)
+
+def get_categories(cache=None, policy=None):
+    log.info("Fetching joke categories...")
+    policy = policy or FetchPolicy.from_env()
     try:
-        res = requests.get(BASE_URL)
+        res = policy.get(requests.Session(), BASE_URL, cache=cache)
         res.raise_for_status()
     except requests.RequestException as e:
-        print(f"Failed to fetch categories: {e}")
+        log.error("Failed to fetch categories: %s", e)
         return []
 
-    soup = BeautifulSoup(res.text, "html.parser")
+    soup = make_soup(res.text, only=CATEGORY_NAV, label="category_index")
     nav_block = soup.select_one("div.left-navigation-block ul")
     categories = []
     if nav_block:
         for li in nav_block.find_all("li"):
             a = li.find("a")
-            if a and a["href"].startswith("https://www.laughfactory.com/jokes/"):
+            if a and a["href"].startswith(f"{BASE_URL}/"):
                 url = a["href"]
                 name = a.select_one("span")
                 cat_name = name.text.strip().replace(" ", "_").lower() if name else "unknown"
-                print(f"  Found category: {cat_name} ({url})")
+                log.info("Found category: %s (%s)", cat_name, url)
                 categories.append({
                     "name": cat_name,
                     "url": url
                 })
     else:
-        print("  No navigation block found.")
+        log.warning("No navigation block found.")
     return categories
 
 def extract_category_slug(category_url):
@@ -43,91 +64,485 @@ def extract_category_slug(category_url):
         return parts[1]
     return ""
 
-def scrape_category(category_url, max_loads=10):
-    print(f"  Scraping jokes from: {category_url}")
-    jokes = []
-    session = requests.Session()
-    category_slug = extract_category_slug(category_url)
-    page = 1
+def parse_jokes(html):
+    # Only the joke blocks are built into the tree; the rest of the page is skipped
+    soup = make_soup(html, only=JOKE_BLOCKS, label="joke_page")
+    results = []
+    with EXTRACT_SECONDS.time(stage="joke_page"):
+        for block in soup.select("div.jokes-main-pane-block"):
+            joke_text = block.select_one("div.joke-text-holder p")
+            joke = joke_text.text.strip() if joke_text else ""
+            # Get username
+            username_elem = block.select_one("div.person-avatar-info.small-avatar small")
+            username = username_elem.text.strip() if username_elem else "unknown"
+            results.append({"joke": joke, "username": username})
+    return results
 
-    # Initial request to get first batch of jokes
-    try:
-        res = session.get(category_url)
-        res.raise_for_status()
-    except requests.RequestException as e:
-        print(f"    Failed to fetch initial jokes: {e}")
-        return jokes
-
-    soup = BeautifulSoup(res.text, "html.parser")
-    joke_blocks = soup.select("div.jokes-main-pane-block")
-    found = 0
-    for block in joke_blocks:
-        joke_text = block.select_one("div.joke-text-holder p")
-        joke = joke_text.text.strip() if joke_text else ""
-        # Get username
-        username_elem = block.select_one("div.person-avatar-info.small-avatar small")
-        username = username_elem.text.strip() if username_elem else "unknown"
-        if joke:
-            print(f"Joke: {joke}\nUsername: {username}\n{'-'*40}")
-            jokes.append({"joke": joke, "username": username})
-            found += 1
-    print(f"    Found {found} jokes on initial page.")
-
-    # Now simulate pressing "Load More" button up to max_loads times
-    for load_num in range(1, max_loads + 1):
-        ajax_url = f"https://www.laughfactory.com/jokes/ajax/load_more?page={load_num+1}&category={category_slug}"
-        print(f"    Loading more jokes, load {load_num}: {ajax_url}")
+def page_url(category_url, category_slug, load_num):
+    # Load 0 is the category page itself, later loads are the "Load More" ajax pages
+    if load_num == 0:
+        return category_url
+    return f"{BASE_URL}/ajax/load_more?page={load_num+1}&category={category_slug}"
+
+# The scraper is a chain of generator stages, fetch -> parse/extract -> dedup -> sink, that
+# pass one page at a time along so memory does not grow with max_loads.
+
+def fetch_pages(category_url, session, limiter, cache=None, start_load=0, max_loads=10, policy=None):
+    """Fetch stage: yields (load_num, html) for the category page and each "Load More" page.
+
+    Transient failures are retried by the fetch policy; a request that still fails is
+    re-raised after logging so callers can tell it from a normal end.
+    """
+    policy = policy or FetchPolicy.from_env()
+    category_slug = extract_category_slug(category_url)
+    for load_num in range(start_load, max_loads + 1):
+        url = page_url(category_url, category_slug, load_num)
+        if load_num:
+            log.info("Loading more jokes, load %d: %s", load_num, url)
 
         try:
-            ajax_res = session.get(ajax_url)
-            ajax_res.raise_for_status()
+            res = policy.get(session, url, cache=cache, limiter=limiter)
+            res.raise_for_status()
         except requests.RequestException as e:
-            print(f"    Failed to load more jokes on load {load_num}: {e}")
-            break
+            if load_num:
+                log.warning("Failed to load more jokes on load %d: %s", load_num, e)
+            else:
+                log.warning("Failed to fetch initial jokes from %s: %s", url, e)
+            raise
 
-        ajax_soup = BeautifulSoup(ajax_res.text, "html.parser")
-        new_joke_blocks = ajax_soup.select("div.jokes-main-pane-block")
-        if not new_joke_blocks:
-            print("    No more jokes returned by load more, stopping.")
-            break
+        yield load_num, res.text
 
-        found = 0
-        for block in new_joke_blocks:
-            joke_text = block.select_one("div.joke-text-holder p")
-            joke = joke_text.text.strip() if joke_text else ""
-            username_elem = block.select_one("div.person-avatar-info.small-avatar small")
-            username = username_elem.text.strip() if username_elem else "unknown"
-            if joke and not any(j["joke"] == joke for j in jokes):  # avoid duplicates
-                print(f"Joke: {joke}\nUsername: {username}\n{'-'*40}")
-                jokes.append({"joke": joke, "username": username})
-                found += 1
+def parse_pages(pages):
+    """Parse and extract stage: yields (load_num, jokes on the page)"""
+    for load_num, html in pages:
+        page_jokes = parse_jokes(html)
+        if load_num and not page_jokes:
+            log.info("No more jokes returned by load more, stopping.")
+            return
+        yield load_num, page_jokes
+
+def dedup_pages(pages, seen, checkpoint=None):
+    """Dedup stage: yields (load_num, new jokes), stopping once a page adds nothing new.
 
-        print(f"    Found {found} new jokes on load {load_num}.")
-        if found == 0:
-            print("    No new jokes found, stopping early.")
-            break
+    In incremental mode it also stops at the first page holding jokes from the previous crawl.
+    """
+    for load_num, page_jokes in pages:
+        new_jokes = []
+        reached_known = False
+        for joke_obj in page_jokes:
+            joke = joke_obj["joke"]
+            fp = fingerprint(joke)
+            if checkpoint is not None and checkpoint.is_known(fp):
+                reached_known = True
+                continue
+            if joke and fp not in seen:  # avoid duplicates
+                seen.add(fp)
+                log.debug("Joke by %s: %s", joke_obj["username"], joke)
+                new_jokes.append(joke_obj)
 
-        time.sleep(1)  # polite delay
+        if load_num:
+            log.info("Found %d new jokes on load %d.", len(new_jokes), load_num)
+        else:
+            log.info("Found %d jokes on initial page.", len(new_jokes))
+        ITEMS_SCRAPED.inc(len(new_jokes), kind="joke")
+        yield load_num, new_jokes
 
+        if reached_known:
+            log.info("Reached jokes from the previous crawl, stopping.")
+            return
+        if load_num and not new_jokes:
+            log.info("No new jokes found, stopping early.")
+            return
+
+def dedup(jokes, seen):
+    """Dedup stage for already-extracted jokes (resumed or existing ones)"""
+    for joke_obj in jokes:
+        fp = fingerprint(joke_obj["joke"])
+        if fp not in seen:
+            seen.add(fp)
+            yield joke_obj
+
+def iter_category_pages(category_url, max_loads=10, limiter=None, checkpoint=None, cache=None, seen=None,
+                        policy=None):
+    """Yields (load_num, new jokes) for one category as each page is scraped.
+
+    With a checkpoint, an interrupted crawl continues after the last recorded page and the
+    checkpoint is marked finished only when paging ends normally.
+    """
+    session = requests.Session()
+    # One request per second per host unless the caller shares a limiter across categories
+    limiter = limiter or HostRateLimiter(rate=1.0)
+    seen = set() if seen is None else seen
+    start_load = 0
+
+    if checkpoint is not None:
+        if checkpoint.in_progress:
+            start_load = checkpoint.last_page + 1
+            log.info("Resuming interrupted crawl at load %d.", start_load)
+        checkpoint.begin()
+
+    pages = fetch_pages(category_url, session, limiter, cache=cache, start_load=start_load, max_loads=max_loads,
+                        policy=policy)
+    try:
+        yield from dedup_pages(parse_pages(pages), seen, checkpoint)
+    except requests.RequestException:
+        return
+    if checkpoint is not None:
+        checkpoint.finish()
+
+def scrape_category(category_url, max_loads=10, limiter=None, checkpoint=None, cache=None, policy=None):
+    log.info("Scraping jokes from: %s", category_url)
+    jokes = []
+    for _, new_jokes in iter_category_pages(category_url, max_loads=max_loads, limiter=limiter,
+                                            checkpoint=checkpoint, cache=cache, policy=policy):
+        jokes.extend(new_jokes)
     return jokes
 
-def save_jokes(category_name, jokes):
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    file_path = os.path.join(OUTPUT_DIR, f"{category_name}.txt")
-    print(f"  Saving {len(jokes)} jokes to {file_path}...")
-    with open(file_path, "w", encoding="utf-8") as f:
-        for i, joke_obj in enumerate(jokes, start=1):
-            f.write(f"[{category_name.upper()} #{i}]\nUser: {joke_obj['username']}\n{joke_obj['joke']}\n\n")
-    print(f"  Done saving {category_name}.")
-    
-def main():
-    categories = get_categories()
-    print(f"Total categories found: {len(categories)}")
-    for cat in categories:
-        print(f"\nProcessing category: {cat['name']}")
-        jokes = scrape_category(cat["url"], max_loads=10)  # you can change max_loads here
-        print(f"  Total jokes found: {len(jokes)}")
-        save_jokes(cat["name"], jokes)
+def category_paths(category_name):
+    return (
+        os.path.join(OUTPUT_DIR, f"{category_name}.txt"),
+        os.path.join(NDJSON_DIR, f"{category_name}.ndjson"),
+    )
+
+def iter_jokes(category_name):
+    """Stream the jokes stored in a category's text file, one record at a time"""
+    file_path, _ = category_paths(category_name)
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, "r", encoding="utf-8") as f:
+        record = None
+        for line in f:
+            if RECORD_HEADER.match(line):
+                if record:
+                    yield from read_record(record)
+                record = []
+            elif record is not None:
+                record.append(line)
+        if record:
+            yield from read_record(record)
+
+def read_record(lines):
+    joke_obj = parse_record(lines[0], "".join(lines[1:]))
+    if joke_obj["joke"]:
+        yield joke_obj
+
+def load_jokes(category_name):
+    return list(iter_jokes(category_name))
+
+def index_existing_jokes(index):
+    """Seed an empty fingerprint index from the category files already on disk"""
+    if not os.path.isdir(OUTPUT_DIR):
+        return
+    log.info("Building fingerprint index from %s/...", OUTPUT_DIR)
+    for filename in sorted(os.listdir(OUTPUT_DIR)):
+        if filename.endswith(".txt"):
+            category_name = filename[:-len(".txt")]
+            index.claim(category_name, iter_jokes(category_name), skip_cross_category=False)
+    index.save()
+    log.info("Indexed %d distinct jokes.", len(index))
+
+def near_dup_existing_jokes(near_dups):
+    """Seed an empty near-duplicate index from the category files already on disk"""
+    if not os.path.isdir(OUTPUT_DIR):
+        return
+    for filename in sorted(os.listdir(OUTPUT_DIR)):
+        if filename.endswith(".txt"):
+            category_name = filename[:-len(".txt")]
+            for joke_obj in iter_jokes(category_name):
+                near_dups.add((category_name, fingerprint(joke_obj["joke"])), joke_obj["joke"], category_name)
+
+def find_near_duplicates(threshold):
+    """Jokes on disk that nearly duplicate an earlier one, earlier categories (by name) winning.
+
+    Returns ({category: jokes to keep}, [(category, position, duplicated category, position, similarity)]).
+    """
+    near_dups = NearDuplicateIndex(threshold)
+    kept, duplicates = {}, []
+    if not os.path.isdir(OUTPUT_DIR):
+        return kept, duplicates
+    for filename in sorted(os.listdir(OUTPUT_DIR)):
+        if not filename.endswith(".txt"):
+            continue
+        category_name = filename[:-len(".txt")]
+        kept[category_name] = []
+        for position, joke_obj in enumerate(iter_jokes(category_name), start=1):
+            matches = near_dups.query(joke_obj["joke"])
+            if matches:
+                (other_category, other_position), _, score = matches[0]
+                duplicates.append((category_name, position, other_category, other_position, score))
+                continue
+            near_dups.add((category_name, position), joke_obj["joke"], category_name)
+            kept[category_name].append(joke_obj)
+    return kept, duplicates
+
+def clean_near_duplicates(threshold, dry_run=False):
+    """Batch mode: report near-duplicate jokes in jokes/ and rewrite the categories holding them"""
+    kept, duplicates = find_near_duplicates(threshold)
+    for category_name, position, other_category, other_position, score in duplicates:
+        log.info("%s #%d is a near-duplicate of %s #%d (%.2f)",
+                 category_name, position, other_category, other_position, score)
+    log.info("Found %d near-duplicate jokes at threshold %.2f.", len(duplicates), threshold)
+    if dry_run or not duplicates:
+        return duplicates
+    index = FingerprintIndex()
+    if not len(index):
+        index_existing_jokes(index)
+    store = ScraperStore()
+    for category_name in sorted({duplicate[0] for duplicate in duplicates}):
+        # Cross-category duplicates were already resolved above, so the index must not drop more
+        save_jokes(category_name, kept[category_name], index=index, skip_cross_category=False, store=store)
+    return duplicates
+
+def store_existing_jokes(store):
+    """Load the category files already on disk into an empty database"""
+    if not os.path.isdir(OUTPUT_DIR):
+        return
+    log.info("Loading %s/ into %s...", OUTPUT_DIR, store.path)
+    for filename in sorted(os.listdir(OUTPUT_DIR)):
+        if filename.endswith(".txt"):
+            category_name = filename[:-len(".txt")]
+            store.replace_category(category_name, iter_jokes(category_name))
+
+class CategoryWriter:
+    """Sink stage: streams a category's jokes into its text and NDJSON files.
+
+    Both files are written as hidden part files and renamed into place by commit(); the
+    fingerprint index and SQLite store are updated at the same time. With a
+    NearDuplicateIndex, jokes that nearly match one already kept are skipped as well.
+    """
+
+    def __init__(self, category_name, index=None, skip_cross_category=True, store=None, near_dups=None):
+        self.category_name = category_name
+        self.index = index
+        self.skip_cross_category = skip_cross_category
+        self.store = store
+        self.near_dups = near_dups
+        text_path, ndjson_path = category_paths(category_name)
+        self.sinks = [TextSink(text_path, category_name), NDJSONSink(ndjson_path, category_name)]
+        self.written = 0
+        self.skipped = 0
+        self.near_skipped = 0
+        self.newest = []
+        if index is not None:
+            index.release(category_name)
+        if near_dups is not None:
+            near_dups.release(category_name)
+
+    def write(self, joke_obj):
+        fp = fingerprint(joke_obj["joke"])
+        if self.near_dups is not None:
+            match = self.near_dups.claim((self.category_name, fp), joke_obj["joke"], self.category_name,
+                                         cross_group=self.skip_cross_category)
+            if match is not None:
+                log.debug("Skipping near-duplicate of a %s joke: %s", match[0], joke_obj["joke"])
+                self.near_skipped += 1
+                return
+        if self.index is not None and not self.index.add(self.category_name, fp, self.skip_cross_category):
+            self.skipped += 1
+            return
+        for sink in self.sinks:
+            sink.write(joke_obj)
+        self.written += 1
+        if len(self.newest) < KNOWN_FINGERPRINTS:
+            self.newest.append(fp)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def commit(self):
+        if self.skipped:
+            log.info("Skipped %d jokes already stored under other categories.", self.skipped)
+        if self.near_skipped:
+            log.info("Skipped %d near-duplicate jokes.", self.near_skipped)
+        log.info("Saving %d jokes to %s...", self.written, self.sinks[0].path)
+        for sink in self.sinks:
+            sink.commit()
+        if self.index is not None:
+            self.index.save()
+        if self.store is not None:
+            self.store.replace_category(self.category_name, iter_jokes(self.category_name))
+        log.info("Done saving %s.", self.category_name)
+
+    def abort(self):
+        """Keep the part files so the next incremental run can resume from them"""
+        for sink in self.sinks:
+            sink.abort()
+        if self.index is not None:
+            # The file on disk is unchanged, so its jokes go back into the index
+            self.index.release(self.category_name)
+            for joke_obj in iter_jokes(self.category_name):
+                self.index.add(self.category_name, fingerprint(joke_obj["joke"]), skip_cross_category=False)
+        if self.near_dups is not None:
+            self.near_dups.release(self.category_name)
+            for joke_obj in iter_jokes(self.category_name):
+                self.near_dups.add((self.category_name, fingerprint(joke_obj["joke"])), joke_obj["joke"],
+                                   self.category_name)
+
+def save_jokes(category_name, jokes, index=None, skip_cross_category=True, store=None):
+    writer = CategoryWriter(category_name, index=index, skip_cross_category=skip_cross_category, store=store)
+    for joke_obj in jokes:
+        writer.write(joke_obj)
+    writer.commit()
+
+def resume_jokes(category_name):
+    """Jokes flushed by an interrupted crawl, taken out of the way of the new part files"""
+    _, ndjson_path = category_paths(category_name)
+    directory, filename = os.path.split(ndjson_path)
+    part_path = os.path.join(directory, f".{filename}.part")
+    resume_path = os.path.join(directory, f".{filename}.resume")
+    if os.path.exists(part_path):
+        os.replace(part_path, resume_path)
+    if not os.path.exists(resume_path):
+        return None
+    return resume_path
+
+def process_category(cat, max_loads=10, limiter=None, index=None, skip_cross_category=True, incremental=False,
+                     cache=None, store=None, near_dups=None, policy=None):
+    with stage(f"category/{cat['name']}"):
+        log.info("Processing category: %s", cat["name"])
+        log.info("Scraping jokes from: %s", cat["url"])
+        checkpoint = CategoryCheckpoint(cat["name"]) if incremental else None
+        resume_path = resume_jokes(cat["name"]) if checkpoint is not None and checkpoint.in_progress else None
+        writer = CategoryWriter(cat["name"], index=index, skip_cross_category=skip_cross_category, store=store,
+                                near_dups=near_dups)
+        seen = set()
+        scraped = 0
+        fetched = False
+
+        if resume_path:
+            for joke_obj in dedup(read_ndjson(resume_path), seen):
+                writer.write(joke_obj)
+                scraped += 1
+            log.info("Restored %d jokes from the interrupted crawl.", scraped)
+
+        for load_num, new_jokes in iter_category_pages(cat["url"], max_loads=max_loads, limiter=limiter,
+                                                       checkpoint=checkpoint, cache=cache, seen=seen,
+                                                       policy=policy):
+            fetched = True
+            for joke_obj in new_jokes:
+                writer.write(joke_obj)
+            scraped += len(new_jokes)
+            # The page is durable in the part files before the checkpoint moves past it
+            writer.flush()
+            if checkpoint is not None:
+                checkpoint.record_page(load_num)
+        log.info("Total jokes found for %s: %d", cat["name"], scraped)
+
+        if checkpoint is not None and checkpoint.in_progress:
+            # Interrupted: leave everything in place for the next run to resume
+            writer.abort()
+            return scraped
+        if not fetched:
+            # Without the category page (failed, or its host's circuit is open) there is
+            # nothing to replace the stored file and rows with
+            log.warning("Category %s could not be fetched, keeping the existing file", cat["name"])
+            writer.abort()
+            return scraped
+
+        if incremental:
+            for joke_obj in dedup(iter_jokes(cat["name"]), seen):
+                writer.write(joke_obj)
+        writer.commit()
+        if checkpoint is not None:
+            checkpoint.commit(writer.newest)
+            if resume_path:
+                os.remove(resume_path)
+        return scraped
+
+async def crawl_async(categories, concurrency=5, rate=1.0, **options):
+    """Scrape many categories at once; total run time is bounded by the per-host rate limit.
+
+    `options` are passed through to process_category().
+    """
+    limiter = HostRateLimiter(rate=rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def run(cat):
+            async with semaphore:
+                try:
+                    return await loop.run_in_executor(
+                        executor, functools.partial(process_category, cat, limiter=limiter, **options)
+                    )
+                except Exception as e:
+                    log.exception("Failed to process category %s: %s", cat["name"], e)
+                    return 0
+
+        counts = await asyncio.gather(*(run(cat) for cat in categories))
+
+    log.info("Scraped %d jokes from %d categories", sum(counts), len(categories))
+    return counts
+
+def main(max_loads=10, concurrency=1, rate=1.0, skip_cross_category=True, incremental=False, cache=None,
+         near_dup_threshold=None):
+    # Profiled when SCRAPER_PROFILE is set (see profiling.py)
+    with profile_run("jokes"):
+        scrape(max_loads, concurrency, rate, skip_cross_category, incremental, cache, near_dup_threshold)
+
+def scrape(max_loads, concurrency, rate, skip_cross_category, incremental, cache, near_dup_threshold):
+    cache = cache or ResponseCache.from_env()
+    with stage("load_existing"):
+        index = FingerprintIndex()
+        if not len(index):
+            index_existing_jokes(index)
+        store = ScraperStore()
+        if not store.category_counts():
+            store_existing_jokes(store)
+        near_dups = None
+        if near_dup_threshold:
+            near_dups = NearDuplicateIndex(near_dup_threshold)
+            near_dup_existing_jokes(near_dups)
+    # One policy for the whole run, so a host that keeps failing trips a single circuit breaker
+    policy = FetchPolicy.from_env()
+    categories = get_categories(cache=cache, policy=policy)
+    log.info("Total categories found: %d", len(categories))
+    options = {
+        "max_loads": max_loads,
+        "index": index,
+        "skip_cross_category": skip_cross_category,
+        "incremental": incremental,
+        "cache": cache,
+        "store": store,
+        "near_dups": near_dups,
+        "policy": policy,
+    }
+    if concurrency > 1:
+        asyncio.run(crawl_async(categories, concurrency=concurrency, rate=rate, **options))
+    else:
+        limiter = HostRateLimiter(rate=rate)
+        for cat in categories:
+            process_category(cat, limiter=limiter, **options)
+    print_parse_stats()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Scrape jokes from laughfactory.com")
+    parser.add_argument("--max-loads", type=int, default=10, help="Number of 'load more' pages per category")
+    parser.add_argument("--concurrency", type=int, default=1, help="Categories to scrape at once (>1 enables the async crawl)")
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second allowed per host")
+    parser.add_argument("--keep-cross-category", action="store_true",
+                        help="Keep jokes already stored under another category instead of skipping them")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only fetch pages until previously seen jokes are reached, resuming interrupted crawls")
+    parser.add_argument("--http-cache", choices=["off", "on", "offline"], default=None,
+                        help="Cache responses on disk, or replay only from the cache (default: $SCRAPER_HTTP_CACHE)")
+    parser.add_argument("--near-dups", type=float, metavar="THRESHOLD",
+                        help="Also skip jokes whose similarity to a stored joke is at least THRESHOLD (e.g. 0.8)")
+    parser.add_argument("--clean-near-dups", action="store_true",
+                        help="Don't scrape; remove near-duplicates from the existing files (threshold from --near-dups)")
+    parser.add_argument("--dry-run", action="store_true", help="With --clean-near-dups, only report what would go")
+    parser.add_argument("--profile", nargs="?", const="on", metavar="MODES",
+                        help="Profile the run: on, all or a list of cpu,cprofile,memory (default: $SCRAPER_PROFILE)")
+    args = parser.parse_args()
+    configure_logging()
+    if args.http_cache:
+        os.environ["SCRAPER_HTTP_CACHE"] = args.http_cache
+    if args.profile:
+        os.environ["SCRAPER_PROFILE"] = args.profile
+    if args.clean_near_dups:
+        clean_near_duplicates(args.near_dups or DEFAULT_THRESHOLD, dry_run=args.dry_run)
+    else:
+        main(max_loads=args.max_loads, concurrency=args.concurrency, rate=args.rate,
+             skip_cross_category=not args.keep_cross_category, incremental=args.incremental,
+             near_dup_threshold=args.near_dups)
@@ -0,0 +1,48 @@
+import json
+import logging
+import os
+import sys
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is structured data
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable lines with `extra=` fields appended as key=value pairs"""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = [f"{key}={value}" for key, value in vars(record).items() if key not in _STANDARD_ATTRS]
+        return f"{line} {' '.join(fields)}" if fields else line
+
+
+def configure_logging(level=None, fmt=None):
+    """Set up root logging from LOG_LEVEL (default INFO) and LOG_FORMAT (text or json)"""
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(KeyValueFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -1,32 +1,131 @@
 from typing import Union
+import datetime
 import os
-from nytimes import NYTimesScraper
+import threading
+from jobs import JobManager
+from corpus import CombinedCorpus, SharedCorpus, iter_chunks
+from store import ScraperStore
+from joke_index import JokeIndex
+from logconfig import configure_logging
+from metrics import REGISTRY
+from profiling import parse_modes, profile_run
 
-from fastapi import FastAPI, Response, Query
+from fastapi import FastAPI, HTTPException, Request, Response, Query
+from fastapi.responses import StreamingResponse
+
+# uvicorn leaves the root logger at WARNING, which would drop the scrape jobs' INFO output
+configure_logging()
 
 app = FastAPI()
+jobs = JobManager()
+# serve.py sets CORPUS_SNAPSHOT_DIR so pre-forked workers map one shared copy of the corpus
+corpus = SharedCorpus("jokes", os.environ["CORPUS_SNAPSHOT_DIR"]) if os.getenv("CORPUS_SNAPSHOT_DIR") else CombinedCorpus("jokes")
+store = ScraperStore()
+# Category files named like the routes below would be shadowed by them
+joke_index = JokeIndex("jokes", reserved=("random", "joke-of-the-day"))
 
 
+def seed_store():
+    """Load jokes/ into an empty store, as a crawl does first, so search covers the existing corpus"""
+    if store.category_counts():
+        return
+    if not os.path.isdir("jokes") or not any(name.endswith(".txt") for name in os.listdir("jokes")):
+        return
+    # Only a fresh database needs this, so the scraping stack is imported just then
+    from jokes import store_existing_jokes
 
-@app.post("/scrape-nytimes")
-async def scrape_nytimes(max_stories: int = Query(default=5, description="Number of stories to scrape")):
-    """Trigger NYTimes scraping and send articles to API"""
-    try:
-        scraper = NYTimesScraper()
+    store_existing_jokes(store)
+
+
+seed_store()
+
+
+
+scraper = None
+scraper_lock = threading.Lock()
+# Scrapes on the shared scraper run one at a time, so a job sees what the previous one delivered
+scrape_lock = threading.Lock()
+
+
+def get_scraper():
+    """The process's NYTimesScraper, created on first use.
+
+    Jobs share it, so there is one delivery thread and session per worker process and
+    selector stats are learned in one place.
+    """
+    global scraper
+    with scraper_lock:
+        if scraper is None:
+            # Imported on first use: requests, BeautifulSoup and the parser stack would otherwise
+            # load in every worker, including ones that only serve jokes
+            from nytimes import NYTimesScraper
+
+            scraper = NYTimesScraper()
+        return scraper
+
+
+def run_nytimes_scrape(max_stories, profile=None):
+    """Blocking scrape executed by the job manager, profiled when `profile` or SCRAPER_PROFILE asks for it"""
+    scraper = get_scraper()
+    with scrape_lock, profile_run("scrape-nytimes", profile) as profiler:
+        # The scraper outlives its runs, so stories it gave up on earlier are retried here
+        scraper.delivery.retry_pending()
         stories = scraper.scrape_stories_with_content(max_stories=max_stories)
-        
-        return {
-            "success": True,
-            "message": f"Successfully processed {len(stories)} stories",
-            "stories_count": len(stories),
-            "requested_count": max_stories
-        }
-    except Exception as e:
+    result = {
+        "success": True,
+        "message": f"Successfully processed {len(stories)} stories",
+        "stories_count": len(stories),
+        "requested_count": max_stories
+    }
+    if profiler is not None:
+        result["profile_dir"] = profiler.directory
+    return result
+
+
+@app.post("/scrape-nytimes", status_code=202)
+async def scrape_nytimes(
+    max_stories: int = Query(default=5, description="Number of stories to scrape"),
+    profile: Union[str, None] = Query(default=None, description="Profile the run: on, all or cpu,cprofile,memory"),
+):
+    """Queue a NYTimes scrape in the background and return its job ID right away"""
+    try:
+        parse_modes(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    job, created = jobs.submit(("scrape-nytimes", max_stories, profile), run_nytimes_scrape, max_stories, profile)
+    return {
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "coalesced": not created,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result"
+    }
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, response: Response):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if not job.done:
+        response.status_code = 202
+        return job.to_dict()
+    if job.status == "failed":
         return {
             "success": False,
-            "error": str(e),
+            "error": job.error,
             "message": "Failed to scrape NYTimes"
         }
+    return job.result
 
 
 @app.get("/")
@@ -38,23 +137,106 @@ def read_root():
 def read_item(item_id: int, q: Union[str, None] = None):
     return {"item_id": item_id, "q": q}
 
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def accepts_gzip(accept_encoding):
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
 @app.get("/get-scraped-jokes")
-def get_scraped_jokes():
-    jokes_dir = "jokes"
-    combined = []
-    print(f"Reading files from directory: {jokes_dir}")
-    for filename in os.listdir(jokes_dir):
-        file_path = os.path.join(jokes_dir, filename)
-        print(f"Processing file: {file_path}")
-        if os.path.isfile(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                print(f"Read {len(content)} characters from {filename}")
-                combined.append(f"--- {filename} ---\n{content}\n")
-    result = "\n".join(combined)
-    output_file = "combined_jokes.txt"
-    with open(output_file, "w", encoding="utf-8") as out_f:
-        out_f.write(result)
-        print(f"Combined jokes written to {output_file}")
-    
-    return Response(content=result, media_type="text/plain")
\ No newline at end of file
+def get_scraped_jokes(request: Request):
+    snapshot = corpus.snapshot()
+    use_gzip = accepts_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": snapshot.etag_for(use_gzip),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if snapshot.matches(request.headers.get("if-none-match"), use_gzip):
+        return Response(status_code=304, headers=headers)
+
+    body = snapshot.body
+    if use_gzip:
+        body = snapshot.gzipped
+        headers["Content-Encoding"] = "gzip"
+    headers["Content-Length"] = str(len(body))
+    return StreamingResponse(iter_chunks(body), media_type="text/plain; charset=utf-8", headers=headers)
+
+
+@app.get("/search/jokes")
+def search_jokes(
+    q: Union[str, None] = Query(default=None, description="Full-text query"),
+    category: Union[str, None] = None,
+    username: Union[str, None] = None,
+    limit: int = Query(default=20, ge=1, le=200),
+    offset: int = Query(default=0, ge=0),
+):
+    results = store.search_jokes(query=q, category=category, username=username, limit=limit, offset=offset)
+    return {"count": len(results), "offset": offset, "results": results}
+
+
+@app.get("/search/articles")
+def search_articles(
+    q: Union[str, None] = Query(default=None, description="Full-text query"),
+    since: Union[float, None] = Query(default=None, description="Only articles scraped after this Unix time"),
+    limit: int = Query(default=20, ge=1, le=200),
+    offset: int = Query(default=0, ge=0),
+):
+    results = store.search_articles(query=q, since=since, limit=limit, offset=offset)
+    return {"count": len(results), "offset": offset, "results": results}
+
+
+@app.get("/search/categories")
+def search_categories():
+    return store.category_counts()
+
+
+@app.get("/jokes/random")
+def random_joke():
+    joke = joke_index.random()
+    if joke is None:
+        raise HTTPException(status_code=404, detail="No jokes scraped yet")
+    return joke
+
+
+@app.get("/jokes/joke-of-the-day")
+def joke_of_the_day(date: Union[datetime.date, None] = Query(default=None, description="Defaults to today (UTC)")):
+    day = date or datetime.datetime.now(datetime.timezone.utc).date()
+    joke = joke_index.joke_of_the_day(day)
+    if joke is None:
+        raise HTTPException(status_code=404, detail="No jokes scraped yet")
+    return {"date": day.isoformat(), **joke}
+
+
+@app.get("/jokes")
+def list_joke_categories():
+    return joke_index.categories()
+
+
+@app.get("/jokes/{category}")
+def list_jokes(category: str, page: int = Query(default=1, ge=1), per_page: int = Query(default=20, ge=1, le=200)):
+    index = joke_index.category(category)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Unknown category")
+    return {
+        "category": category,
+        "page": page,
+        "per_page": per_page,
+        "total": len(index),
+        "jokes": index.page(page, per_page)
+    }
+
+
+@app.get("/jokes/{category}/{number}")
+def get_joke(category: str, number: int):
+    joke = joke_index.get(category, number)
+    if joke is None:
+        raise HTTPException(status_code=404, detail="Unknown joke")
+    return joke
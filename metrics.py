@@ -0,0 +1,137 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; covers fast cache hits up to slow article fetches
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(tuple(labels.get(name, "") for name in self.labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                # Per-bucket counts (+Inf last), sum, count
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "scraper_request_seconds", "Time spent on HTTP GETs, including cache lookups", ["host", "source"])
+DOWNLOADED_BYTES = REGISTRY.counter(
+    "scraper_downloaded_bytes_total", "Response body bytes received from the network", ["host"])
+CACHE_RESULTS = REGISTRY.counter(
+    "scraper_http_cache_total", "Response cache lookups by result", ["result"])
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram(
+    "scraper_rate_limit_wait_seconds", "Time spent waiting for a per-host rate limit token", ["host"])
+PARSE_SECONDS = REGISTRY.histogram(
+    "scraper_parse_seconds", "HTML parse time per document", ["page"])
+EXTRACT_SECONDS = REGISTRY.histogram(
+    "scraper_extract_seconds", "Time spent extracting data from parsed documents", ["stage"])
+FETCH_RETRIES = REGISTRY.counter(
+    "scraper_fetch_retries_total", "Fetch attempts that were retried", ["reason"])
+CIRCUIT_OPENED = REGISTRY.counter(
+    "scraper_circuit_opened_total", "Times a host's circuit breaker opened", ["host"])
+CIRCUIT_REJECTED = REGISTRY.counter(
+    "scraper_circuit_rejected_total", "Requests not sent because the host's circuit was open", ["host"])
+FORBIDDEN_RESPONSES = REGISTRY.counter(
+    "scraper_forbidden_total", "HTTP 403 responses", ["host"])
+ALTERNATIVE_ACCESS = REGISTRY.counter(
+    "scraper_alternative_access_total", "try_alternative_access() outcomes", ["outcome"])
+DELIVERY_SECONDS = REGISTRY.histogram(
+    "scraper_delivery_seconds", "Latency of story delivery POSTs to the API", ["outcome"])
+ITEMS_SCRAPED = REGISTRY.counter(
+    "scraper_items_total", "Jokes and articles produced by the scrapers", ["kind"])
+SELECTOR_CALLS = REGISTRY.counter(
+    "scraper_selector_calls_total", "select() calls made by the NYT selector cascades", ["cascade"])
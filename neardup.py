@@ -0,0 +1,138 @@
+import hashlib
+import random
+import threading
+
+from fingerprints import normalize_text
+
+# Mersenne prime for the (a * x + b) mod p hash family
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 64
+SHINGLE_SIZE = 5
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Character shingles of the normalized text, so punctuation and spacing don't matter"""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def shingle_hashes(text):
+    return frozenset(
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+        for shingle in shingles(text)
+    )
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def band_layout(threshold, num_perm):
+    """(bands, rows) with the fewest bands that still makes pairs at `threshold` candidates 95% of the time"""
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= 0.95:
+            return bands, rows
+    return num_perm, 1
+
+
+class MinHasher:
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, hashes):
+        """MinHash signature of a set of shingle hashes"""
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH for a, b in self.params)
+
+
+class NearDuplicateIndex:
+    """LSH index of MinHash signatures: lookups only compare against items sharing a band.
+
+    Candidates are confirmed with the exact Jaccard similarity of their shingle sets, so
+    the threshold is not blurred by the error of a 64-value signature.
+
+    Items carry a `group` (the joke's category) so a group's entries can be released
+    before it is rewritten, as FingerprintIndex does.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, seed=1):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands, self.rows = band_layout(threshold, num_perm)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.items = {}
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows] for i in range(self.bands)]
+
+    def query(self, text, hashes=None):
+        """(key, group, similarity) for stored items at or above the threshold, most similar first"""
+        hashes = shingle_hashes(text) if hashes is None else hashes
+        signature = self.hasher.signature(hashes)
+        with self.lock:
+            candidates = set()
+            for bucket, band in zip(self.buckets, self.band_keys(signature)):
+                candidates.update(bucket.get(band, ()))
+            matches = []
+            for key in candidates:
+                group, _, other = self.items[key]
+                score = jaccard(hashes, other)
+                if score >= self.threshold:
+                    matches.append((key, group, score))
+        return sorted(matches, key=lambda match: -match[2])
+
+    def add(self, key, text, group=None, hashes=None):
+        hashes = shingle_hashes(text) if hashes is None else hashes
+        signature = self.hasher.signature(hashes)
+        with self.lock:
+            self.items[key] = (group, signature, hashes)
+            for bucket, band in zip(self.buckets, self.band_keys(signature)):
+                bucket.setdefault(band, set()).add(key)
+
+    def remove(self, key):
+        with self.lock:
+            group, signature, _ = self.items.pop(key)
+            for bucket, band in zip(self.buckets, self.band_keys(signature)):
+                bucket[band].discard(key)
+                if not bucket[band]:
+                    del bucket[band]
+
+    def release(self, group):
+        """Forget every item of a group"""
+        with self.lock:
+            for key in [key for key, item in self.items.items() if item[0] == group]:
+                self.remove(key)
+
+    def claim(self, key, text, group=None, cross_group=True):
+        """Add `text` unless it nearly duplicates a stored item; returns the matching key or None.
+
+        With `cross_group` off only items of the same group count as duplicates.
+        """
+        hashes = shingle_hashes(text)
+        with self.lock:
+            for match_key, match_group, _ in self.query(text, hashes):
+                if cross_group or match_group == group:
+                    return match_key
+            self.add(key, text, group, hashes)
+        return None
+
+
+def collapse(texts, threshold=DEFAULT_THRESHOLD):
+    """`texts` without items that nearly duplicate an earlier one"""
+    index = NearDuplicateIndex(threshold)
+    return [text for position, text in enumerate(texts) if index.claim(position, text) is None]
@@ -1,17 +1,79 @@
 import requests
-from bs4 import BeautifulSoup
-import time
 import re
 from urllib.parse import urljoin, urlparse
 import random
 import os
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from httpcache import ResponseCache
+from fetchpolicy import CircuitOpen, FetchPolicy
+from logconfig import configure_logging
+from metrics import ALTERNATIVE_ACCESS, EXTRACT_SECONDS, FORBIDDEN_RESPONSES, ITEMS_SCRAPED, SELECTOR_CALLS
+from parsing import ARTICLE_BODY, make_soup, print_parse_stats
+from ratelimit import HostRateLimiter
+from delivery import StoryDelivery
+from store import ScraperStore
+from neardup import NearDuplicateIndex
+from extraction import DEFAULT_AD_PHRASES, AdFilter, ArticleExtractor
+from selectorstats import SelectorStats
+from articlecache import ArticleCache, DeliveryLedger, content_hash
+from profiling import profile_run, stage
+
+log = logging.getLogger(__name__)
 
 class NYTimesScraper:
-    def __init__(self):
+    # Fallback cascades, in priority order; SelectorStats only skips selectors that keep
+    # missing when they match in none of the page's stories
+    STORY_SELECTORS = [
+        '[data-tpl="sli"]',  # Story list item
+        '.story-wrapper',    # Story wrapper
+        'article',           # Article tags
+        '[class*="story"]'   # Any class containing "story"
+    ]
+    TITLE_SELECTORS = [
+        '[data-tpl="h"] a',
+        'h1 a', 'h2 a', 'h3 a',
+        '.indicate-hover',
+        '[class*="headline"]',
+        'a[href*="/2025/"]'  # Links to 2025 articles
+    ]
+    SUMMARY_SELECTORS = [
+        '.summary-class',
+        '[class*="summary"]',
+        'p[class*="css-"]',  # Generic paragraph with CSS class
+        '.css-sarx3u p'      # Specific to the example
+    ]
+    TIME_SELECTORS = ['time', '[datetime]', '[data-time]']
+
+    # Article body containers, tried in order
+    ARTICLE_SELECTORS = [
+        'section[name="articleBody"]',
+        '.StoryBodyCompanionColumn',
+        '[data-testid*="companionColumn"]',
+        '.css-s99gbd',
+        'section.meteredContent',
+        '.css-at9mc1',  # Specific paragraph class from your example
+        '[class*="story-body"]',
+        '.article-body'
+    ]
+
+    def __init__(self, cache=None, max_workers=None, rate=None, store=None, near_dup_threshold=None,
+                 ad_phrases=None, selector_stats=None, article_cache=None, ledger=None, policy=None):
         self.session = requests.Session()
+        self.store = store if store is not None else ScraperStore()
+        # Shared on-disk response cache (see httpcache.py); SCRAPER_HTTP_CACHE=offline replays recorded pages
+        self.cache = cache if cache is not None else ResponseCache.from_env()
         base_api_url = os.getenv('CAPI_URL', 'http://localhost:4000')
         self.api_url = f"{base_api_url}/news/create"
+        # Set CAPI_BATCH_PATH when the API accepts a JSON list of stories in one request
+        batch_path = os.getenv('CAPI_BATCH_PATH')
+        self.delivery = StoryDelivery(
+            self.api_url,
+            batch_url=f"{base_api_url}{batch_path}" if batch_path else None,
+            on_ack=self.record_delivery,
+            should_send=self.should_deliver,
+        )
         # Rotate user agents to appear more human-like
         self.user_agents = [
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -20,11 +82,31 @@ class NYTimesScraper:
             'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         ]
         self.update_headers()
-        self.base_url = "https://www.nytimes.com"
+        self.base_url = os.getenv('NYT_BASE_URL', 'https://www.nytimes.com').rstrip('/')
+        # Articles are fetched by a small worker pool sharing one token bucket per host
+        self.max_workers = max_workers or int(os.getenv('NYT_MAX_WORKERS', '4'))
+        self.limiter = HostRateLimiter(rate=rate or float(os.getenv('NYT_RATE', '1.0')))
+        # Backoff only after failures, honouring Retry-After, and a circuit breaker per host
+        self.policy = policy if policy is not None else FetchPolicy.from_env()
+        # Also collapse paragraphs that nearly repeat an earlier one (e.g. 0.8); off by default
+        threshold = near_dup_threshold or os.getenv('NYT_NEAR_DUP')
+        self.near_dup_threshold = float(threshold) if threshold else None
+        # Paragraphs containing any of these phrases are dropped as ads or site chrome
+        self.ad_filter = AdFilter(ad_phrases or DEFAULT_AD_PHRASES)
+        self.extractors = {}
+        self.selector_stats = selector_stats if selector_stats is not None else SelectorStats()
+        # Repeat runs only fetch articles that are new or whose cached copy expired, and only
+        # send stories the API hasn't already accepted in the same form
+        self.article_cache = article_cache if article_cache is not None else ArticleCache()
+        self.ledger = ledger if ledger is not None else DeliveryLedger(self.article_cache.path)
     
     def update_headers(self):
         """Update headers with random user agent and additional headers"""
-        headers = {
+        self.session.headers.update(self.random_headers())
+
+    def random_headers(self):
+        """Browser-like headers with a random user agent"""
+        return {
             'User-Agent': random.choice(self.user_agents),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
@@ -37,68 +119,79 @@ class NYTimesScraper:
             'Sec-Fetch-Site': 'none',
             'Cache-Control': 'max-age=0',
         }
-        self.session.headers.update(headers)
+
+    @property
+    def replaying(self):
+        """True when pages are served only from the offline cache, so politeness delays are pointless"""
+        return self.cache is not None and self.cache.offline
+    
+    def fetch(self, url, **kwargs):
+        """GET through the cache, rate limiter and fetch policy"""
+        limiter = None if self.replaying else self.limiter
+        return self.policy.get(self.session, url, cache=self.cache, limiter=limiter, **kwargs)
     
     def get_homepage_stories(self):
         """Scrape stories from NY Times homepage"""
         try:
-            response = self.session.get(self.base_url, timeout=10)
+            response = self.fetch(self.base_url, timeout=10)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = make_soup(response.content, label="homepage")
             
             stories = []
+            story_elements = []
             
-            # Look for story containers using multiple selectors
-            story_selectors = [
-                '[data-tpl="sli"]',  # Story list item
-                '.story-wrapper',    # Story wrapper
-                'article',           # Article tags
-                '[class*="story"]'   # Any class containing "story"
-            ]
-            
-            for selector in story_selectors:
-                story_elements = soup.select(selector)
-                if story_elements:
-                    print(f"Found {len(story_elements)} stories using selector: {selector}")
-                    break
-            
-            for story_element in story_elements[:10]:  # Limit to first 10 stories
-                story_data = self.extract_story_data(story_element)
-                if story_data:
-                    stories.append(story_data)
+            with EXTRACT_SECONDS.time(stage='homepage'):
+                # Look for story containers
+                for selector in self.STORY_SELECTORS:
+                    SELECTOR_CALLS.inc(cascade='story')
+                    story_elements = soup.select(selector)
+                    if story_elements:
+                        self.selector_stats.record('story', selector)
+                        log.info('Found %d stories using selector: %s', len(story_elements), selector)
+                        break
+                    self.selector_stats.miss('story', selector)
+                
+                story_elements = story_elements[:10]  # Limit to first 10 stories
+                skip = self.absent_selectors(story_elements)
+                for story_element in story_elements:
+                    story_data = self.extract_story_data(story_element, skip)
+                    if story_data:
+                        stories.append(story_data)
             
             return stories
             
         except Exception as e:
-            print(f"Error scraping homepage: {e}")
+            log.error('Error scraping homepage: %s', e)
             return []
     
-    def extract_story_data(self, element):
-        """Extract title, summary, and link from story element"""
+    def absent_selectors(self, story_elements):
+        """Per cascade, the selectors that keep missing and match in none of `story_elements`.
+
+        extract_story_data() skips them for those stories without changing what it finds.
+        """
+        return {
+            cascade: self.selector_stats.absent(cascade, story_elements, selectors)
+            for cascade, selectors in (
+                ('title', self.TITLE_SELECTORS),
+                ('summary', self.SUMMARY_SELECTORS),
+                ('time', self.TIME_SELECTORS),
+            )
+        }
+    
+    def extract_story_data(self, element, skip=None):
+        """Extract title, summary, and link from story element
+
+        `skip` maps a cascade to selectors known not to match in the story (see absent_selectors()).
+        """
+        skip = skip or {}
         story_data = {}
         
         # Find title using multiple approaches
-        title_selectors = [
-            '[data-tpl="h"] a',
-            'h1 a', 'h2 a', 'h3 a',
-            '.indicate-hover',
-            '[class*="headline"]',
-            'a[href*="/2025/"]'  # Links to 2025 articles
-        ]
-        
-        title_element = None
-        link = None
-        
-        for selector in title_selectors:
-            elements = element.select(selector)
-            if elements:
-                title_element = elements[0]
-                if title_element.get('href'):
-                    link = title_element.get('href')
-                break
-        
+        _, title_element = self.selector_stats.select(
+            'title', element, self.TITLE_SELECTORS, skip=skip.get('title', ()))
         if not title_element:
             return None
+        link = title_element.get('href')
         
         # Extract title text
         title = title_element.get_text(strip=True)
@@ -114,241 +207,288 @@ class NYTimesScraper:
             story_data['link'] = link
         
         # Find summary/description
-        summary_selectors = [
-            '.summary-class',
-            '[class*="summary"]',
-            'p[class*="css-"]',  # Generic paragraph with CSS class
-            '.css-sarx3u p'      # Specific to the example
-        ]
-        
         summary = ""
-        for selector in summary_selectors:
-            summary_elements = element.select(selector)
-            if summary_elements:
-                summary = summary_elements[0].get_text(strip=True)
+        for selector in self.selector_stats.order('summary', self.SUMMARY_SELECTORS, skip.get('summary', ())):
+            SELECTOR_CALLS.inc(cascade='summary')
+            summary_element = self.selector_stats.compile(selector).select_one(element)
+            if summary_element is not None:
+                summary = summary_element.get_text(strip=True)
                 if len(summary) > 20:  # Only use if substantial
+                    self.selector_stats.record('summary', selector)
                     break
+            self.selector_stats.miss('summary', selector)
         
         story_data['summary'] = summary
         
         # Extract timestamp if available
-        time_selectors = ['time', '[datetime]', '[data-time]']
-        for selector in time_selectors:
-            time_elements = element.select(selector)
-            if time_elements:
-                time_text = time_elements[0].get_text(strip=True)
-                story_data['timestamp'] = time_text
-                break
+        _, time_element = self.selector_stats.select(
+            'time', element, self.TIME_SELECTORS, skip=skip.get('time', ()))
+        if time_element is not None:
+            story_data['timestamp'] = time_element.get_text(strip=True)
         
         return story_data
     
     def get_full_article(self, url):
-        """Scrape full article content from article URL with multiple fallback strategies"""
-        max_retries = 3
+        """Scrape full article content from article URL, falling back to minimal headers on a 403"""
+        log.info('Fetching article: %s', url)
         
-        for attempt in range(max_retries):
-            try:
-                print(f"Fetching article (attempt {attempt + 1}): {url}")
-                
-                # Update headers for each request
-                self.update_headers()
-                
-                # Add referrer to look more natural
-                headers = {'Referer': self.base_url}
-                
-                # Random delay between requests
-                time.sleep(random.uniform(2, 5))
-                
-                response = self.session.get(url, headers=headers, timeout=15)
-                
-                # Handle different status codes
-                if response.status_code == 403:
-                    print(f"Access forbidden (403) for {url}")
-                    if attempt < max_retries - 1:
-                        print(f"Retrying with different approach...")
-                        time.sleep(random.uniform(5, 10))
-                        continue
-                    else:
-                        return self.try_alternative_access(url)
-                
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                return self.extract_article_content(soup)
-                
-            except requests.exceptions.RequestException as e:
-                print(f"Request error on attempt {attempt + 1}: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(random.uniform(5, 10))
-                    continue
-            except Exception as e:
-                print(f"Unexpected error on attempt {attempt + 1}: {e}")
-                if attempt < max_retries - 1:
-                    continue
+        # Fresh headers for each request, passed per request since workers share the session
+        headers = self.random_headers()
+        
+        # Add referrer to look more natural
+        headers['Referer'] = self.base_url
+        
+        try:
+            # Retries, backoff and the host's circuit breaker are handled by the fetch policy
+            response = self.fetch(url, headers=headers, timeout=15)
+            
+            if response.status_code == 403:
+                log.warning('Access forbidden (403) for %s', url)
+                FORBIDDEN_RESPONSES.inc(host=urlparse(url).netloc)
+                # The same request again would be refused again, so try a different one right away
+                return self.try_alternative_access(url)
+            
+            response.raise_for_status()
+            return self.parse_article(response.content)
+            
+        except CircuitOpen as e:
+            log.warning('Skipping article: %s', e)
+        except requests.exceptions.RequestException as e:
+            log.error('Failed to fetch article %s: %s', url, e)
+        except Exception as e:
+            log.exception('Unexpected error fetching %s: %s', url, e)
         
-        print(f"Failed to fetch article after {max_retries} attempts")
         return []
     
     def try_alternative_access(self, url):
         """Try alternative methods to access the article"""
-        print("Trying alternative access methods...")
+        log.info('Trying alternative access methods...')
         
-        # Try accessing through Google Cache (if available)
-        # Or try a different approach with minimal headers
+        # Retry with minimal headers, over the pooled session so the connection is reused
         try:
-            minimal_session = requests.Session()
-            minimal_session.headers.update({
+            response = self.fetch(url, headers={
                 'User-Agent': 'Mozilla/5.0 (compatible; NewsBot/1.0)',
-            })
-            
-            response = minimal_session.get(url, timeout=10)
+                'Accept': '*/*',
+                'Accept-Language': None,
+                'DNT': None,
+                'Upgrade-Insecure-Requests': None,
+                'Sec-Fetch-Dest': None,
+                'Sec-Fetch-Mode': None,
+                'Sec-Fetch-Site': None,
+                'Cache-Control': None,
+            }, timeout=10)
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                return self.extract_article_content(soup)
+                ALTERNATIVE_ACCESS.inc(outcome='ok')
+                return self.parse_article(response.content)
             else:
-                print(f"Alternative access failed with status: {response.status_code}")
+                ALTERNATIVE_ACCESS.inc(outcome=str(response.status_code))
+                log.warning('Alternative access failed with status: %s', response.status_code)
                 
+        except CircuitOpen as e:
+            ALTERNATIVE_ACCESS.inc(outcome='circuit_open')
+            log.warning('Alternative access skipped: %s', e)
         except Exception as e:
-            print(f"Alternative access error: {e}")
+            ALTERNATIVE_ACCESS.inc(outcome='error')
+            log.warning('Alternative access error: %s', e)
         
         return []
     
-    def extract_article_content(self, soup):
+    def parse_article(self, markup):
+        """Parse an article page, building only the article body when the page has one"""
+        # The first selector wins whenever it yields content, so a soup holding just the
+        # articleBody sections gives the same result as the full document
+        soup = make_soup(markup, only=ARTICLE_BODY, label="article_body")
+        with EXTRACT_SECONDS.time(stage='article_body'):
+            content = self.extract_article_content(soup, selectors=self.ARTICLE_SELECTORS[:1], broad_search=False)
+        if content:
+            return content
+        soup = make_soup(markup, label="article")
+        with EXTRACT_SECONDS.time(stage='article'):
+            return self.extract_article_content(soup)
+
+    def article_extractor(self, selectors):
+        """Compiled single-pass extractor for a selector cascade"""
+        key = tuple(selectors)
+        extractor = self.extractors.get(key)
+        if extractor is None:
+            extractor = self.extractors[key] = ArticleExtractor(key, ad_filter=self.ad_filter)
+        return extractor
+
+    def extract_article_content(self, soup, selectors=None, broad_search=True):
         """Extract article content from BeautifulSoup object"""
-        # Look for article body using multiple selectors
-        article_selectors = [
-            'section[name="articleBody"]',
-            '.StoryBodyCompanionColumn',
-            '[data-testid*="companionColumn"]',
-            '.css-s99gbd',
-            'section.meteredContent',
-            '.css-at9mc1',  # Specific paragraph class from your example
-            '[class*="story-body"]',
-            '.article-body'
-        ]
-        
-        article_content = []
-        
-        for selector in article_selectors:
-            content_sections = soup.select(selector)
-            if content_sections:
-                print(f"Found content using selector: {selector}")
-                for section in content_sections:
-                    # Extract paragraphs
-                    paragraphs = section.select('p')
-                    for p in paragraphs:
-                        text = p.get_text(strip=True)
-                        # Filter out short paragraphs and ads
-                        if len(text) > 50 and not self.is_ad_content(text):
-                            article_content.append(text)
-                if article_content:  # If we found content, break
-                    break
-        
-        # If no structured content found, try broader search
-        if not article_content:
-            print("No structured content found, trying broader search...")
-            all_paragraphs = soup.select('p')
-            for p in all_paragraphs:
-                text = p.get_text(strip=True)
-                if len(text) > 100 and not self.is_ad_content(text):
-                    article_content.append(text)
+        # One walk over the tree scores every body selector; paragraphs of the first one
+        # (in priority order) that yields content win, else every long <p> in the page
+        extractor = self.article_extractor(selectors or self.ARTICLE_SELECTORS)
+        article_content, selector = extractor.extract(soup, broad_search=broad_search)
+        if selector:
+            log.debug('Found content using selector: %s', selector)
+        elif article_content:
+            log.debug('No structured content found, used broader search')
         
         # Remove duplicates while preserving order
         seen = set()
+        near_dups = NearDuplicateIndex(self.near_dup_threshold) if self.near_dup_threshold else None
         unique_content = []
-        for paragraph in article_content:
-            if paragraph not in seen:
-                seen.add(paragraph)
-                unique_content.append(paragraph)
+        for i, paragraph in enumerate(article_content):
+            if paragraph in seen:
+                continue
+            if near_dups is not None and near_dups.claim(i, paragraph) is not None:
+                continue
+            seen.add(paragraph)
+            unique_content.append(paragraph)
         
         return unique_content
     
     def is_ad_content(self, text):
         """Check if text is likely advertisement or non-article content"""
-        ad_indicators = [
-            'subscribe', 'subscription', 'advertisement', 
-            'support our journalism', 'times access',
-            'play these games', 'connections', 'spelling bee',
-            'crossword', 'newsletter', 'sign up', 'log in',
-            'create account', 'paywall', 'digital subscription'
-        ]
-        text_lower = text.lower()
-        return any(indicator in text_lower for indicator in ad_indicators)
+        return self.ad_filter(text)
+    
+    def build_payload(self, story):
+        """API payload for a story"""
+        return {
+            'title': story.get('title', ''),
+            'summary': story.get('summary', ''),
+            'content': '\n\n'.join(story.get('full_content', [])) if story.get('full_content') else '',
+            'date': story.get('timestamp', '')
+        }
     
     def send_story_to_api(self, story):
-        """Send story data to the API endpoint"""
+        """Send story data to the API endpoint right away over the pooled delivery session"""
         try:
-            # Prepare the payload
-            payload = {
-                'title': story.get('title', ''),
-                'summary': story.get('summary', ''),
-                'content': '\n\n'.join(story.get('full_content', [])) if story.get('full_content') else '',
-                'date': story.get('timestamp', '')
-            }
+            log.info('Sending story to API: %s', self.api_url)
+            status = self.delivery.post([self.build_payload(story)])
             
-            headers = {
-                'Content-Type': 'application/json',
-                'User-Agent': 'NYTimesScraper/1.0'
-            }
-            
-            print(f"Sending story to API: {self.api_url}")
-            response = requests.post(
-                self.api_url, 
-                json=payload, 
-                headers=headers, 
-                timeout=10
-            )
-            
-            if response.status_code == 200 or response.status_code == 201:
-                print(f"✓ Successfully sent story: {story['title'][:50]}...")
+            if status == 200 or status == 201:
+                log.info('Successfully sent story: %s', story['title'][:50])
                 return True
-            else:
-                print(f"✗ API error {response.status_code}: {response.text}")
-                return False
+            return False
                 
         except Exception as e:
-            print(f"✗ Failed to send story to API: {e}")
+            log.error('Failed to send story to API: %s', e)
             return False
     
+    def queue_story_for_api(self, story):
+        """Journal the story and hand it to the background delivery worker; returns a Future[bool]"""
+        return self.delivery.submit(self.build_payload(story))
+    
+    def queue_new_story(self, story):
+        """Queue a story unless it was delivered unchanged or is still journaled; returns (digest, Future) or None"""
+        payload = self.build_payload(story)
+        digest = content_hash(payload)
+        if 'link' not in story:
+            return digest, self.delivery.submit(payload)
+        # A replay of recorded pages sends everything, whatever live runs delivered before
+        if not self.replaying and self.ledger.delivered(story['link'], digest):
+            return None
+        # The ledger entry travels with the journal entry, so a replayed send records it too
+        meta = {'url': story['link'], 'digest': digest}
+        # Still in the journal from an earlier run: it is being replayed or retried already
+        if self.delivery.is_pending(meta):
+            return None
+        return digest, self.delivery.submit(payload, meta=meta)
+    
+    def record_delivery(self, meta):
+        """Ledger a story the API accepted (called by the delivery worker)"""
+        self.ledger.record(meta['url'], meta['digest'])
+    
+    def should_deliver(self, meta):
+        """Whether a journaled story still needs sending (asked by the delivery worker before a replay)"""
+        return not self.ledger.delivered(meta['url'], meta['digest'])
+    
+    def settle_deliveries(self, deliveries):
+        """Wait for queued (story, digest, Future) deliveries; returns how many were accepted"""
+        self.delivery.flush()
+        self.delivery.journal.compact()
+        # Accepted stories were already ledgered by record_delivery as their sends succeeded
+        return sum(1 for _, _, future in deliveries if future.result())
+    
+    def get_cached_article(self, url):
+        """Article paragraphs from the article cache, fetching and caching them on a miss"""
+        if self.replaying:
+            # Extract from the recorded page itself rather than a live run's cached result
+            return self.get_full_article(url)
+        content = self.article_cache.get(url)
+        if content is None:
+            content = self.get_full_article(url)
+            # Empty results (paywall, errors) aren't cached so the next run tries again
+            if content:
+                self.article_cache.put(url, content)
+        return content
+    
+    def fetch_articles(self, stories):
+        """Fetch article content for several stories at once, yielded in story order"""
+        def fetch_one(story):
+            if 'link' not in story:
+                return None
+            with stage(f"article{urlparse(story['link']).path}"):
+                return self.get_cached_article(story['link'])
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Yielded as soon as each article (and every one before it) is done
+            yield from executor.map(fetch_one, stories)
+    
     def scrape_stories_with_content(self, max_stories=5):
         """Main method to scrape homepage and get full article content"""
-        print("Scraping NY Times homepage...")
-        stories = self.get_homepage_stories()
+        log.info('Scraping NY Times homepage...')
+        cache_hits = self.article_cache.hits
+        with stage('homepage'):
+            stories = self.get_homepage_stories()
         
         if not stories:
-            print("No stories found on homepage")
+            log.warning('No stories found on homepage')
             return []
         
-        print(f"Found {len(stories)} stories on homepage")
+        log.info('Found %d stories on homepage', len(stories))
+        
+        stories = stories[:max_stories]
+        articles = self.fetch_articles(stories)
         
         detailed_stories = []
-        successful_sends = 0
+        deliveries = []
+        already_queued = 0
         
-        for i, story in enumerate(stories[:max_stories]):
-            print(f"\nProcessing story {i+1}: {story['title'][:50]}...")
+        for i, (story, article_content) in enumerate(zip(stories, articles)):
+            log.info('Processing story %d: %s', i + 1, story['title'][:50])
             
             if 'link' in story:
-                article_content = self.get_full_article(story['link'])
                 story['full_content'] = article_content
                 story['content_length'] = len(article_content)
                 
                 if article_content:
-                    print(f"Successfully extracted {len(article_content)} paragraphs")
+                    ITEMS_SCRAPED.inc(kind='article')
+                    log.info('Extracted %d paragraphs', len(article_content), extra={'url': story['link']})
                 else:
-                    print("No content extracted")
+                    log.warning('No content extracted', extra={'url': story['link']})
             
-            # Send story to API
-            if self.send_story_to_api(story):
-                successful_sends += 1
+            # Journal and send in the background while the next articles are fetched
+            queued = self.queue_new_story(story)
+            if queued is None:
+                already_queued += 1
+            else:
+                deliveries.append((story, *queued))
             
             detailed_stories.append(story)
         
-        print(f"\n✓ Successfully sent {successful_sends}/{len(detailed_stories)} stories to API")
+        with stage('store_and_deliver'):
+            self.selector_stats.save()
+            stored = self.store.upsert_articles(detailed_stories)
+            log.info('Stored %d articles in %s', stored, self.store.path)
+            
+            successful_sends = self.settle_deliveries(deliveries)
+        log.info('Successfully sent %d/%d stories to API (%d already delivered or pending, %d articles from cache)',
+                 successful_sends, len(deliveries), already_queued, self.article_cache.hits - cache_hits)
         return detailed_stories
 
 def main():
     scraper = NYTimesScraper()
-    stories = scraper.scrape_stories_with_content(max_stories=3)
+    try:
+        # Profiled when SCRAPER_PROFILE is set (see profiling.py)
+        with profile_run('nytimes'):
+            stories = scraper.scrape_stories_with_content(max_stories=3)
+    finally:
+        # Compacts the journal and releases this sender's entries for the next run to replay
+        scraper.delivery.close()
+    print_parse_stats()
     
     for i, story in enumerate(stories, 1):
         print(f"\n{'='*50}")
@@ -377,4 +517,5 @@ def main():
             print("\nNo full content available")
 
 if __name__ == "__main__":
+    configure_logging()
     main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import importlib.util
+import logging
+import os
+import re
+import threading
+import time
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from metrics import PARSE_SECONDS
+
+log = logging.getLogger(__name__)
+
+
+def default_parser():
+    """SCRAPER_PARSER if set, otherwise lxml when installed, falling back to the stdlib parser"""
+    configured = os.getenv("SCRAPER_PARSER")
+    if configured:
+        return configured
+    if importlib.util.find_spec("lxml") is not None:
+        return "lxml"
+    return "html.parser"
+
+
+PARSER = default_parser()
+
+
+def has_class(name):
+    """Strainer matcher for one class of a multi-valued class attribute"""
+    return re.compile(rf"(?:^|\s){re.escape(name)}(?:\s|$)")
+
+
+# Targeted strainers: only these subtrees are built into the soup
+JOKE_BLOCKS = SoupStrainer("div", class_=has_class("jokes-main-pane-block"))
+CATEGORY_NAV = SoupStrainer("div", class_=has_class("left-navigation-block"))
+ARTICLE_BODY = SoupStrainer("section", attrs={"name": "articleBody"})
+
+_stats_lock = threading.Lock()
+PARSE_STATS = {}
+
+
+def make_soup(markup, only=None, label="document", parser=None):
+    """Parse `markup` with the configured backend, optionally restricted to `only` subtrees.
+
+    Time spent and bytes parsed are accumulated per `label` in PARSE_STATS.
+    """
+    start = time.perf_counter()
+    soup = BeautifulSoup(markup, parser or PARSER, parse_only=only)
+    elapsed = time.perf_counter() - start
+    PARSE_SECONDS.observe(elapsed, page=label)
+
+    with _stats_lock:
+        stats = PARSE_STATS.setdefault(label, {"count": 0, "seconds": 0.0, "bytes": 0})
+        stats["count"] += 1
+        stats["seconds"] += elapsed
+        stats["bytes"] += len(markup)
+    return soup
+
+
+def parse_stats():
+    with _stats_lock:
+        return {label: dict(stats) for label, stats in PARSE_STATS.items()}
+
+
+def print_parse_stats():
+    stats = parse_stats()
+    if not stats:
+        return
+    for label, s in sorted(stats.items()):
+        avg_ms = s["seconds"] / s["count"] * 1000
+        log.info("Parse time (%s) %s: %d docs, %.0f KiB, %.3fs total, %.2fms avg",
+                 PARSER, label, s["count"], s["bytes"] / 1024, s["seconds"], avg_ms)
@@ -0,0 +1,292 @@
+"""Opt-in profiling of scrape runs.
+
+    SCRAPER_PROFILE=on python jokes.py          # sampled stacks + allocations
+    SCRAPER_PROFILE=cpu,cprofile python nytimes.py
+
+Modes are "cpu" (a sampling profiler written as folded stacks, for flamegraph.pl or
+speedscope), "cprofile" (a deterministic cProfile of the thread that started the run,
+saved as a .prof file for pstats or snakeviz) and "memory" (tracemalloc snapshots at the
+end of every stage). "on" means cpu and memory, "all" means all three. Each run writes
+its files and a top-N summary.txt to a new directory under SCRAPER_PROFILE_DIR.
+
+Code marks its stages with `with stage("category/puns"):`. That costs one global lookup
+when no profile is running, so the calls stay in place in production.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+DEFAULT_PROFILE_DIR = os.path.join("data", "profiles")
+MODES = ("cpu", "cprofile", "memory")
+
+_NO_STAGE = nullcontext()
+_active = None
+_active_lock = threading.Lock()
+
+log = logging.getLogger(__name__)
+
+
+def parse_modes(value):
+    """Profiling modes from a SCRAPER_PROFILE-style value; () when profiling is off"""
+    value = (value or "").strip().lower()
+    if value in ("", "0", "off", "no", "false"):
+        return ()
+    if value in ("1", "on", "yes", "true"):
+        return ("cpu", "memory")
+    if value == "all":
+        return MODES
+    modes = tuple(mode.strip() for mode in value.split(",") if mode.strip())
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        raise ValueError(f"Unknown profiling mode(s): {', '.join(sorted(unknown))}")
+    return modes
+
+
+def stage(name):
+    """Attribute samples and allocations to `name` while a profile is running"""
+    profiler = _active
+    if profiler is None:
+        return _NO_STAGE
+    return profiler.stage(name)
+
+
+@contextmanager
+def profile_run(name, modes=None):
+    """Profile the enclosed run; yields the Profiler, or None when profiling is off.
+
+    `modes` is a SCRAPER_PROFILE-style string and defaults to the environment variable.
+    Only one run is profiled at a time, and a run that starts while another is being
+    profiled goes unprofiled.
+    """
+    global _active
+    modes = parse_modes(os.getenv("SCRAPER_PROFILE") if modes is None else modes)
+    if not modes:
+        yield None
+        return
+    with _active_lock:
+        if _active is not None:
+            log.warning("Profile of %s already running, not profiling %s", _active.name, name)
+            profiler = None
+        else:
+            profiler = _active = Profiler(name, modes)
+    if profiler is None:
+        yield None
+        return
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        with _active_lock:
+            _active = None
+        profiler.stop()
+        profiler.write()
+
+
+def take_snapshot():
+    """tracemalloc snapshot without the profiler's own allocations (samples, earlier snapshots)"""
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+
+def _safe_name(text):
+    return re.sub(r"[^\w.-]+", "_", text).strip("_")[:80] or "stage"
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of threads that are inside a stage every `interval` seconds.
+
+    Samples are wall-clock: a thread waiting on the network is counted as well, which is
+    what matters for a slow crawl. Each stack is prefixed with the thread's innermost stage.
+    """
+
+    def __init__(self, stage_of, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.stage_of = stage_of
+        self.interval = interval
+        self.samples = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                current = self.stage_of(ident)
+                if current is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(current)
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.allocated = 0
+
+
+class Profiler:
+    """One profiled run: samplers, per-stage statistics and the files they end up in"""
+
+    def __init__(self, name, modes, directory=None, interval=None, top=None):
+        self.name = name
+        self.modes = modes
+        base = os.getenv("SCRAPER_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+        self.directory = directory or os.path.join(base, f"{_safe_name(name)}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        self.interval = interval or float(os.getenv("SCRAPER_PROFILE_INTERVAL", "0.005"))
+        self.top = top or int(os.getenv("SCRAPER_PROFILE_TOP", "20"))
+        self.stages = {}
+        self.stacks = {}
+        self.lock = threading.Lock()
+        self.sampler = None
+        self.cprofile = None
+        self.snapshots = 0
+        self.started = None
+        self.elapsed = 0.0
+        self.owner = threading.get_ident()
+
+    def stage_of(self, ident):
+        stack = self.stacks.get(ident)
+        if stack:
+            return stack[-1]
+        # The thread that started the run is sampled outside of stages too
+        return self.name if ident == self.owner else None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        log.info("Profiling %s (%s) into %s", self.name, ",".join(self.modes), self.directory)
+        self.started = time.perf_counter()
+        if "memory" in self.modes:
+            tracemalloc.start(int(os.getenv("SCRAPER_PROFILE_FRAMES", "5")))
+            self.baseline = take_snapshot()
+        if "cpu" in self.modes:
+            self.sampler = StackSampler(self.stage_of, self.interval)
+            self.sampler.start()
+        if "cprofile" in self.modes:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.started
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+        if "memory" in self.modes:
+            self.final = take_snapshot()
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the stage, and diff allocations over it when tracing memory.
+
+        With concurrent stages the allocation diff also counts what other threads
+        allocated in the meantime.
+        """
+        stack = self.stacks.setdefault(threading.get_ident(), [])
+        stack.append(name)
+        before = take_snapshot() if "memory" in self.modes and tracemalloc.is_tracing() else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            diff = None
+            if before is not None and tracemalloc.is_tracing():
+                after = take_snapshot()
+                diff = after.compare_to(before, "lineno")
+                with self.lock:
+                    self.snapshots += 1
+                    path = os.path.join(self.directory, "memory", f"{self.snapshots:04d}-{_safe_name(name)}.snapshot")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                after.dump(path)
+            with self.lock:
+                stats = self.stages.setdefault(name, StageStats())
+                stats.calls += 1
+                stats.seconds += elapsed
+                if diff is not None:
+                    stats.allocated += sum(entry.size_diff for entry in diff)
+
+    def write(self):
+        if self.sampler is not None:
+            with open(os.path.join(self.directory, "cpu.folded"), "w", encoding="utf-8") as f:
+                for stack, count in sorted(self.sampler.samples.items()):
+                    f.write(f"{stack} {count}\n")
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(os.path.join(self.directory, "cprofile.prof"))
+        if "memory" in self.modes:
+            os.makedirs(os.path.join(self.directory, "memory"), exist_ok=True)
+            self.final.dump(os.path.join(self.directory, "memory", "final.snapshot"))
+        summary = self.summary()
+        with open(os.path.join(self.directory, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(summary)
+        log.info("Profile of %s written to %s\n%s", self.name, self.directory, summary)
+
+    def summary(self):
+        """Top-N report of the run: slowest stages, hottest functions and largest allocations"""
+        top = self.top
+        lines = [f"Profile of {self.name}: {self.elapsed:.2f}s, modes {','.join(self.modes)}", ""]
+
+        lines.append(f"Stages by total time (top {top}):")
+        stages = sorted(self.stages.items(), key=lambda item: -item[1].seconds)
+        for name, stats in stages[:top]:
+            memory = f"  {stats.allocated / 1024:+10.1f} KiB" if "memory" in self.modes else ""
+            lines.append(f"  {stats.seconds:9.3f}s  {stats.calls:5d}x{memory}  {name}")
+        lines.append("")
+
+        if self.sampler is not None:
+            samples = self.sampler.samples
+            total = sum(samples.values()) or 1
+            own, inclusive = Counter(), Counter()
+            for stack, count in samples.items():
+                frames = stack.split(";")[1:]
+                if frames:
+                    own[frames[-1]] += count
+                for frame in set(frames):
+                    inclusive[frame] += count
+            lines.append(f"Sampled stacks: {total} samples every {self.interval * 1000:.0f}ms")
+            lines.append(f"  Self time (top {top}):")
+            for frame, count in own.most_common(top):
+                lines.append(f"    {100 * count / total:5.1f}%  {frame}")
+            lines.append(f"  Including callees (top {top}):")
+            for frame, count in inclusive.most_common(top):
+                lines.append(f"    {100 * count / total:5.1f}%  {frame}")
+            lines.append("")
+
+        if self.cprofile is not None:
+            stream = io.StringIO()
+            pstats.Stats(self.cprofile, stream=stream).sort_stats("cumulative").print_stats(top)
+            lines.append(f"cProfile of the run's thread by cumulative time (top {top}):")
+            lines.extend("  " + line for line in stream.getvalue().strip().splitlines())
+            lines.append("")
+
+        if "memory" in self.modes:
+            lines.append(f"Memory: {self.peak / 1024 / 1024:.1f} MiB peak traced")
+            lines.append(f"  Growth over the run by line (top {top}):")
+            for entry in self.final.compare_to(self.baseline, "lineno")[:top]:
+                lines.append(f"    {entry.size_diff / 1024:+10.1f} KiB  {entry.count_diff:+7d} blocks  {entry.traceback[0]}")
+            lines.append("")
+        return "\n".join(lines)
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+from metrics import RATE_LIMIT_WAIT_SECONDS
+from sqlitedb import SQLiteDatabase
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds the caller must wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            # Callers queue up behind each other: a negative balance is paid back at `rate`
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """Block the calling thread until a token is available"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a token is available"""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class HostRateLimiter:
+    """Keeps one token bucket per host so every site is throttled independently"""
+
+    def __init__(self, rate=1.0, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host):
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.capacity)
+            return self.buckets[host]
+
+    def acquire(self, url):
+        host = urlparse(url).netloc or url
+        start = time.perf_counter()
+        self.bucket(host).acquire()
+        RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - start, host=host)
+
+    async def acquire_async(self, url):
+        host = urlparse(url).netloc or url
+        start = time.perf_counter()
+        await self.bucket(host).acquire_async()
+        RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - start, host=host)
+
+
+class SharedRateLimiter(SQLiteDatabase):
+    """Per-host token buckets kept in SQLite so separate worker processes share one limit.
+
+    Same interface as HostRateLimiter. Bucket state is read and updated inside one
+    IMMEDIATE transaction, and wall-clock time is used since it is shared between processes.
+    """
+
+    schema = "CREATE TABLE IF NOT EXISTS rate_buckets (host TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);"
+    autocommit = True
+
+    def __init__(self, path, rate=1.0, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        super().__init__(path)
+
+    def reserve(self, host):
+        """Take a token for `host` and return how many seconds to wait before using it"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE host = ?", (host,)).fetchone()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate)
+            tokens -= 1
+            conn.execute(
+                "INSERT INTO rate_buckets (host, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (host) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (host, tokens, now),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def acquire(self, url):
+        host = urlparse(url).netloc or url
+        start = time.perf_counter()
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+        RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - start, host=host)
+
+    async def acquire_async(self, url):
+        host = urlparse(url).netloc or url
+        start = time.perf_counter()
+        delay = await asyncio.to_thread(self.reserve, host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - start, host=host)
@@ -0,0 +1,149 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+
+import soupsieve
+
+from metrics import SELECTOR_CALLS
+
+DEFAULT_STATS_PATH = os.path.join("data", "selector_stats.json")
+# A selector that has missed this many times in a row is checked once per page instead of once per element
+DEFAULT_MISS_THRESHOLD = 20
+
+log = logging.getLogger(__name__)
+
+
+def apply_changes(misses, changes):
+    """Fold changes (see SelectorStats.changes) into consecutive miss counts, in place"""
+    for cascade, selectors in changes.items():
+        counts = misses.setdefault(cascade, {})
+        for selector, (matched, count) in selectors.items():
+            counts[selector] = count if matched else counts.get(selector, 0) + count
+    return misses
+
+
+class SelectorStats:
+    """Persistent record of the selectors in each fallback cascade that keep missing.
+
+    Cascades are always tried in their written order, so results never depend on the
+    stats. What the stats save is work: the selectors known to miss in a cascade (at
+    least `miss_threshold` misses in a row, none since) are checked together, in one
+    pass over the elements of a page, by absent(); the ones that match nothing there
+    are skipped for each of those elements. A known miss that does match keeps its place.
+
+    Several scrapers may share the stats file: save() merges this instance's
+    observations into what is on disk under an flock on `<path>.lock`.
+    """
+
+    def __init__(self, path=DEFAULT_STATS_PATH, miss_threshold=DEFAULT_MISS_THRESHOLD):
+        self.path = path
+        self.miss_threshold = miss_threshold
+        # cascade -> selector -> [matched since the last save, misses since then]
+        self.changes = {}
+        self.compiled = {}
+        self.lock = threading.Lock()
+        # cascade -> selector -> consecutive misses
+        self.misses = self.read()
+
+    def read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Could not read selector stats %s: %s", self.path, e)
+            return {}
+        # Files from before miss counting held win scores, which say nothing about misses
+        return data.get("misses", {}) if isinstance(data, dict) else {}
+
+    def save(self):
+        """Merge the changes since the last save into the stats file"""
+        if not self.path:
+            return
+        with self.lock:
+            changes, self.changes = self.changes, {}
+        if not changes:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Unique name, so a save in another process can't write into the same file
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                merged = self.read()
+                apply_changes(merged, changes)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"misses": merged}, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        with self.lock:
+            # Adopt what other scrapers saw, keeping what happened here while saving
+            self.misses = apply_changes(merged, self.changes)
+
+    def known_miss(self, cascade, selector):
+        return self.misses.get(cascade, {}).get(selector, 0) >= self.miss_threshold
+
+    def compile(self, selector):
+        if selector not in self.compiled:
+            self.compiled[selector] = soupsieve.compile(selector)
+        return self.compiled[selector]
+
+    def matches_any(self, cascade, roots, selector):
+        for root in roots:
+            SELECTOR_CALLS.inc(cascade=cascade)
+            if self.compile(selector).select_one(root) is not None:
+                return True
+        return False
+
+    def absent(self, cascade, roots, selectors):
+        """The known misses among `selectors` that match nothing in any of `roots`.
+
+        Callers pass the result as `skip` when selecting in those roots; skipping a
+        selector that can't match there leaves every result as the written order's.
+        """
+        known = [selector for selector in selectors if self.known_miss(cascade, selector)]
+        if not known:
+            return frozenset()
+        # One pass for all of them, which is all it takes while the layout stays put
+        if len(known) > 1 and not self.matches_any(cascade, roots, ", ".join(known)):
+            return frozenset(known)
+        return frozenset(selector for selector in known if not self.matches_any(cascade, roots, selector))
+
+    def order(self, cascade, selectors, skip=()):
+        """`selectors` in written order, without those in `skip`"""
+        if not skip:
+            return list(selectors)
+        return [selector for selector in selectors if selector not in skip]
+
+    def record(self, cascade, selector):
+        """Count a match for `selector`, which clears its misses"""
+        with self.lock:
+            self.misses.setdefault(cascade, {})[selector] = 0
+            self.changes.setdefault(cascade, {})[selector] = [True, 0]
+
+    def miss(self, cascade, selector):
+        """Count a try of `selector` that matched nothing usable"""
+        with self.lock:
+            counts = self.misses.setdefault(cascade, {})
+            counts[selector] = counts.get(selector, 0) + 1
+            self.changes.setdefault(cascade, {}).setdefault(selector, [False, 0])[1] += 1
+
+    def select(self, cascade, root, selectors, accept=None, skip=()):
+        """First (selector, first match) in order() whose match passes `accept`, else (None, None).
+
+        Uses select_one(), since only the first match of each selector is ever used.
+        """
+        for selector in self.order(cascade, selectors, skip):
+            SELECTOR_CALLS.inc(cascade=cascade)
+            element = self.compile(selector).select_one(root)
+            if element is not None and (accept is None or accept(element)):
+                self.record(cascade, selector)
+                return selector, element
+            self.miss(cascade, selector)
+        return None, None
@@ -0,0 +1,55 @@
+"""Multi-worker API server sharing one read-only copy of the joke data.
+
+    python serve.py --workers 4 --port 8000
+
+The corpus snapshot and the joke index sidecars are built once here, before any worker
+starts. The workers then memory-map those files (see corpus.SharedCorpus and
+joke_index.CategoryIndex), so the data is held once in the page cache however many
+workers run. Scraping modules are only imported by a worker that runs a scrape job.
+"""
+import argparse
+import logging
+import os
+import time
+
+import uvicorn
+
+from corpus import DEFAULT_SNAPSHOT_DIR, SharedCorpus
+from joke_index import JokeIndex
+from jokes import store_existing_jokes
+from logconfig import configure_logging
+from store import ScraperStore
+
+log = logging.getLogger(__name__)
+
+
+def prepare(jokes_dir="jokes", snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """Build the shared corpus snapshot and joke index sidecars so workers start by mapping them"""
+    start = time.perf_counter()
+    snapshot = SharedCorpus(jokes_dir, snapshot_dir).snapshot()
+    counts = JokeIndex(jokes_dir).categories()
+    # Seeded once here rather than by every worker at once
+    store = ScraperStore()
+    if not store.category_counts():
+        store_existing_jokes(store)
+    log.info("Prepared %d KiB corpus and %d category indexes in %.2fs",
+             len(snapshot.body) // 1024, len(counts), time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from several pre-forked workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--snapshot-dir", default=os.getenv("CORPUS_SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR),
+                        help="Where the memory-mapped corpus snapshots are kept")
+    args = parser.parse_args()
+    configure_logging()
+    # Inherited by the workers, which switch main.corpus to the mapped snapshots
+    os.environ["CORPUS_SNAPSHOT_DIR"] = args.snapshot_dir
+    prepare(snapshot_dir=args.snapshot_dir)
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
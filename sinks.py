@@ -0,0 +1,89 @@
+import json
+import os
+import re
+
+# The line TextSink writes before each record; group 1 is the record number
+RECORD_HEADER = re.compile(r"^\[[A-Z0-9_]+ #(\d+)\]\r?$")
+
+
+class AtomicSink:
+    """Writes records incrementally to a hidden `.<name>.part` file next to `path`.
+
+    commit() renames the part file over `path`, so readers only ever see complete files.
+    abort() keeps the part file so an interrupted crawl can be resumed from it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory, filename = os.path.split(path)
+        self.part_path = os.path.join(directory, f".{filename}.part")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.part_path, "w", encoding="utf-8")
+        self.count = 0
+
+    def format(self, joke_obj):
+        raise NotImplementedError
+
+    def write(self, joke_obj):
+        self.count += 1
+        self.file.write(self.format(joke_obj))
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def commit(self):
+        self.flush()
+        self.file.close()
+        os.replace(self.part_path, self.path)
+
+    def abort(self):
+        self.flush()
+        self.file.close()
+
+
+class TextSink(AtomicSink):
+    """The `[CATEGORY #n]` text format served from jokes/"""
+
+    def __init__(self, path, category_name):
+        super().__init__(path)
+        self.label = category_name.upper()
+
+    def format(self, joke_obj):
+        return f"[{self.label} #{self.count}]\nUser: {joke_obj['username']}\n{joke_obj['joke']}\n\n"
+
+
+class NDJSONSink(AtomicSink):
+    """One JSON object per line"""
+
+    def __init__(self, path, category_name):
+        super().__init__(path)
+        self.category_name = category_name
+
+    def format(self, joke_obj):
+        record = {
+            "category": self.category_name,
+            "number": self.count,
+            "username": joke_obj["username"],
+            "joke": joke_obj["joke"],
+        }
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def parse_record(user_line, body):
+    """Joke dict for a TextSink record, from the line after its header and the text after that"""
+    user_line = user_line.rstrip("\n")
+    username = user_line[len("User: "):] if user_line.startswith("User: ") else "unknown"
+    return {"joke": body.strip(), "username": username}
+
+
+def read_ndjson(path):
+    """Stream joke dicts back out of an NDJSON file, ignoring a torn last line"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            yield {"joke": record["joke"], "username": record["username"]}
@@ -0,0 +1,40 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteDatabase:
+    """Base for the SQLite-backed stores: one WAL-mode connection per thread.
+
+    WAL lets readers work while a scrape writes, and per-thread connections let crawler
+    threads, worker processes and the FastAPI thread pool share one database file.
+    Subclasses set `schema` (run on open), `row_factory`, and `autocommit` when they
+    manage transactions themselves with BEGIN IMMEDIATE.
+    """
+
+    schema = None
+    row_factory = None
+    autocommit = False
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.schema:
+            self.connection().executescript(self.schema)
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            if self.autocommit:
+                conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            else:
+                conn = sqlite3.connect(self.path, timeout=30)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
@@ -0,0 +1,175 @@
+import os
+import re
+import sqlite3
+import time
+
+from fingerprints import fingerprint
+from sqlitedb import SQLiteDatabase
+
+DEFAULT_DB_PATH = os.getenv("SCRAPER_DB", os.path.join("data", "scraper.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jokes (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    text TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    UNIQUE (category, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS jokes_by_category ON jokes (category, position);
+CREATE INDEX IF NOT EXISTS jokes_by_fingerprint ON jokes (fingerprint);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS jokes_fts USING fts5 (
+    text, username, content='jokes', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS jokes_ai AFTER INSERT ON jokes BEGIN
+    INSERT INTO jokes_fts (rowid, text, username) VALUES (new.id, new.text, new.username);
+END;
+CREATE TRIGGER IF NOT EXISTS jokes_ad AFTER DELETE ON jokes BEGIN
+    INSERT INTO jokes_fts (jokes_fts, rowid, text, username) VALUES ('delete', old.id, old.text, old.username);
+END;
+
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    published TEXT NOT NULL,
+    content TEXT NOT NULL,
+    scraped_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_by_scraped_at ON articles (scraped_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5 (
+    title, summary, content, content='articles', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts (rowid, title, summary, content) VALUES (new.id, new.title, new.summary, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, summary, content)
+    VALUES ('delete', old.id, old.title, old.summary, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, summary, content)
+    VALUES ('delete', old.id, old.title, old.summary, old.content);
+    INSERT INTO articles_fts (rowid, title, summary, content) VALUES (new.id, new.title, new.summary, new.content);
+END;
+"""
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching all of its words (prefix match on the last)"""
+    words = re.findall(r"\w+", text, re.UNICODE)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class ScraperStore(SQLiteDatabase):
+    """SQLite store for jokes and articles with FTS5 search.
+
+    Shared by the crawlers and the FastAPI thread pool (see SQLiteDatabase).
+    """
+
+    schema = SCHEMA
+    row_factory = sqlite3.Row
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        super().__init__(path)
+
+    def replace_category(self, category, jokes):
+        """Store a category's jokes in file order, replacing what was stored for it before"""
+        now = time.time()
+        rows = [
+            (category, position, joke_obj["username"], joke_obj["joke"], fingerprint(joke_obj["joke"]), now)
+            for position, joke_obj in enumerate(jokes, start=1)
+        ]
+        with self.connection() as conn:
+            conn.execute("DELETE FROM jokes WHERE category = ?", (category,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO jokes (category, position, username, text, fingerprint, scraped_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def upsert_articles(self, stories):
+        """Insert or refresh scraped stories, keyed by article URL"""
+        now = time.time()
+        rows = [
+            (
+                story["link"],
+                story.get("title", ""),
+                story.get("summary", ""),
+                story.get("timestamp", ""),
+                "\n\n".join(story.get("full_content") or []),
+                now,
+            )
+            for story in stories if story.get("link")
+        ]
+        with self.connection() as conn:
+            conn.executemany(
+                "INSERT INTO articles (url, title, summary, published, content, scraped_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET title = excluded.title, summary = excluded.summary, "
+                "published = excluded.published, content = excluded.content, scraped_at = excluded.scraped_at",
+                rows,
+            )
+        return len(rows)
+
+    def search_jokes(self, query=None, category=None, username=None, limit=20, offset=0):
+        """Jokes matching a full-text query and/or filters, best matches first"""
+        match = fts_query(query) if query else None
+        clauses, params = [], []
+        if match:
+            clauses.append("jokes_fts MATCH ?")
+            params.append(match)
+        if category:
+            clauses.append("j.category = ?")
+            params.append(category)
+        if username:
+            clauses.append("j.username = ?")
+            params.append(username)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        if match:
+            sql = (f"SELECT j.id, j.category, j.position, j.username, j.text FROM jokes_fts "
+                   f"JOIN jokes j ON j.id = jokes_fts.rowid {where} ORDER BY jokes_fts.rank LIMIT ? OFFSET ?")
+        else:
+            sql = (f"SELECT j.id, j.category, j.position, j.username, j.text FROM jokes j "
+                   f"{where} ORDER BY j.category, j.position LIMIT ? OFFSET ?")
+        rows = self.connection().execute(sql, params + [limit, offset]).fetchall()
+        return [dict(row) for row in rows]
+
+    def search_articles(self, query=None, since=None, limit=20, offset=0):
+        """Articles matching a full-text query, optionally only those scraped after `since`"""
+        match = fts_query(query) if query else None
+        clauses, params = [], []
+        if match:
+            clauses.append("articles_fts MATCH ?")
+            params.append(match)
+        if since is not None:
+            clauses.append("a.scraped_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        if match:
+            sql = (f"SELECT a.id, a.url, a.title, a.summary, a.published, a.scraped_at, "
+                   f"snippet(articles_fts, 2, '[', ']', '...', 16) AS snippet FROM articles_fts "
+                   f"JOIN articles a ON a.id = articles_fts.rowid {where} "
+                   f"ORDER BY articles_fts.rank LIMIT ? OFFSET ?")
+        else:
+            sql = (f"SELECT a.id, a.url, a.title, a.summary, a.published, a.scraped_at, "
+                   f"substr(a.content, 1, 200) AS snippet FROM articles a {where} "
+                   f"ORDER BY a.scraped_at DESC LIMIT ? OFFSET ?")
+        rows = self.connection().execute(sql, params + [limit, offset]).fetchall()
+        return [dict(row) for row in rows]
+
+    def category_counts(self):
+        rows = self.connection().execute(
+            "SELECT category, COUNT(*) AS jokes FROM jokes GROUP BY category ORDER BY category"
+        ).fetchall()
+        return {row["category"]: row["jokes"] for row in rows}
@@ -0,0 +1,78 @@
+import gzip
+import mmap
+import os
+
+import pytest
+
+from corpus import CombinedCorpus, CorpusSnapshot, SharedCorpus
+
+
+def test_if_none_match_only_matches_the_encoding_being_served():
+    snapshot = CorpusSnapshot(b"[PUNS #1]\nUser: @a\nA joke\n\n")
+    assert snapshot.matches(snapshot.etag, gzipped=False)
+    assert snapshot.matches(f"W/{snapshot.gzip_etag}", gzipped=True)
+    # A client that cached one encoding gets the other one in full
+    assert not snapshot.matches(snapshot.gzip_etag, gzipped=False)
+    assert not snapshot.matches(snapshot.etag, gzipped=True)
+    assert snapshot.matches(f'"other", {snapshot.etag}', gzipped=False)
+    assert snapshot.matches("*", gzipped=True)
+    assert not snapshot.matches(None)
+
+
+def write_jokes(directory, files):
+    directory.mkdir(exist_ok=True)
+    for name, text in files.items():
+        (directory / name).write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def jokes_dir(tmp_path):
+    directory = tmp_path / "jokes"
+    write_jokes(directory, {
+        "puns.txt": "[PUNS #1]\nUser: @a\nA pun\n\n",
+        "clean_jokes.txt": "[CLEAN_JOKES #1]\nUser: @b\nA clean joke\n\n",
+        # An in-progress write, which isn't served
+        ".puns.txt.part": "[PUNS #1]\nUser: @a\nHalf-writ",
+    })
+    return directory
+
+
+def test_snapshot_is_built_once_and_mapped(tmp_path, jokes_dir):
+    corpus = SharedCorpus(str(jokes_dir), str(tmp_path / "snapshots"))
+    snapshot = corpus.snapshot()
+    assert bytes(snapshot.body) == CombinedCorpus(str(jokes_dir)).snapshot().body
+    assert b"Half-writ" not in bytes(snapshot.body)
+    assert gzip.decompress(snapshot.gzipped) == bytes(snapshot.body)
+    assert isinstance(snapshot.body, mmap.mmap) and isinstance(snapshot.gzipped, mmap.mmap)
+    body_path, gzip_path = corpus.paths(corpus.scan())
+    assert sorted(os.listdir(tmp_path / "snapshots")) == sorted([os.path.basename(body_path), os.path.basename(gzip_path)])
+
+
+def test_other_workers_map_the_snapshot_instead_of_building_it(tmp_path, jokes_dir, monkeypatch):
+    snapshot_dir = str(tmp_path / "snapshots")
+    first = SharedCorpus(str(jokes_dir), snapshot_dir).snapshot()
+
+    def build(self, signature):
+        raise AssertionError("snapshot rebuilt")
+
+    monkeypatch.setattr(CombinedCorpus, "build", build)
+    worker = SharedCorpus(str(jokes_dir), snapshot_dir)
+    snapshot = worker.snapshot()
+    assert bytes(snapshot.body) == bytes(first.body)
+    assert snapshot.etag == first.etag
+    # Unchanged files: the worker keeps serving the mapping it has
+    assert worker.snapshot() is snapshot
+
+
+def test_changed_files_replace_the_snapshot(tmp_path, jokes_dir):
+    snapshot_dir = tmp_path / "snapshots"
+    corpus = SharedCorpus(str(jokes_dir), str(snapshot_dir))
+    old = corpus.snapshot()
+    old_body = bytes(old.body)
+    write_jokes(jokes_dir, {"puns.txt": "[PUNS #1]\nUser: @a\nA better pun\n\n"})
+    new = corpus.snapshot()
+    assert b"A better pun" in bytes(new.body)
+    assert new.etag != old.etag
+    # The old files are gone, but a worker still mapping them keeps reading them
+    assert len(os.listdir(snapshot_dir)) == 2
+    assert bytes(old.body) == old_body
@@ -0,0 +1,182 @@
+import threading
+
+import pytest
+
+from benchserver import StandInConfig, StandInServer
+from delivery import DeliveryJournal, StoryDelivery
+
+
+@pytest.fixture
+def server():
+    with StandInServer(StandInConfig()) as server:
+        yield server
+
+
+def sender(server, tmp_path, **options):
+    options.setdefault("backoff", 0.01)
+    return StoryDelivery(f"{server.url}/news/create", journal_path=str(tmp_path / "journal.jsonl"), **options)
+
+
+def story(n):
+    return {"title": f"Story {n}", "link": f"https://example.com/{n}"}
+
+
+def titles(server):
+    return sorted(payload["title"] for _, payload in server.received)
+
+
+def test_live_senders_do_not_replay_each_other(server, tmp_path):
+    server.config.latency = 0.2
+    first = sender(server, tmp_path)
+    futures = [first.submit(story(n)) for n in range(3)]
+    second = sender(server, tmp_path)
+    futures.append(second.submit(story(3)))
+    second.close()
+    first.close()
+    assert all(future.result() for future in futures)
+    assert titles(server) == [f"Story {n}" for n in range(4)]
+    assert server.counts["POST"] == 4
+
+
+def test_closed_sender_failures_are_replayed_by_the_next_one(server, tmp_path):
+    server.config.error_rate = 1.0
+    first = sender(server, tmp_path, max_attempts=1)
+    assert first.submit(story(0)).result() is False
+    first.close()
+    assert [payload for _, payload, _ in first.journal.pending()] == [story(0)]
+
+    server.config.error_rate = 0.0
+    second = sender(server, tmp_path)
+    second.start()
+    second.close()
+    assert titles(server) == ["Story 0"]
+    assert second.journal.pending() == []
+
+
+def test_entries_of_a_crashed_process_are_replayed(server, tmp_path):
+    journal = DeliveryJournal(str(tmp_path / "journal.jsonl"))
+    # An owner without a held lock file is a sender that died before settling its entry
+    journal.append("enqueue", "abc", story(0), owner="gone-1234-deadbeef")
+    journal.append("enqueue", "def", story(1))
+    delivery = sender(server, tmp_path)
+    delivery.start()
+    delivery.close()
+    assert titles(server) == ["Story 0", "Story 1"]
+
+
+def test_permanent_rejection_is_settled_not_replayed(server, tmp_path):
+    server.config.error_rate = 1.0
+    server.config.error_status = 422
+    first = sender(server, tmp_path)
+    assert first.submit(story(0)).result() is False
+    first.close()
+    assert server.counts["POST"] == 1
+    assert first.journal.pending() == []
+
+    server.config.error_rate = 0.0
+    second = sender(server, tmp_path)
+    second.start()
+    second.close()
+    assert server.counts["POST"] == 1
+
+
+def test_batches_share_one_post(server, tmp_path):
+    server.config.latency = 0.1
+    delivery = sender(server, tmp_path, batch_url=f"{server.url}/news/batch", batch_size=5)
+    futures = [delivery.submit(story(n)) for n in range(7)]
+    delivery.close()
+    assert all(future.result() for future in futures)
+    assert server.counts["stories"] == 7
+    assert server.counts["POST"] <= 3
+    assert all(path == "/news/batch" for path, _ in server.received)
+
+
+def test_compaction_keeps_concurrent_appends(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    writer, compactor = DeliveryJournal(path), DeliveryJournal(path)
+    stop = threading.Event()
+
+    def compact():
+        while not stop.is_set():
+            compactor.compact()
+
+    thread = threading.Thread(target=compact)
+    thread.start()
+    for n in range(200):
+        writer.append("enqueue", str(n), story(n), owner="someone")
+    stop.set()
+    thread.join()
+    assert [item_id for item_id, _, _ in writer.pending()] == [str(n) for n in range(200)]
+
+
+def test_meta_is_acked_for_replayed_entries(server, tmp_path):
+    server.config.error_rate = 1.0
+    first = sender(server, tmp_path, max_attempts=1)
+    assert first.submit(story(0), meta={"url": "https://example.com/0"}).result() is False
+    first.close()
+
+    server.config.error_rate = 0.0
+    acked = []
+    second = sender(server, tmp_path, on_ack=acked.append)
+    second.start()
+    second.submit(story(1))
+    second.close()
+    assert acked == [{"url": "https://example.com/0"}]
+    # meta stays in the journal, the API only sees the payload
+    assert sorted(payload["title"] for _, payload in server.received) == ["Story 0", "Story 1"]
+    assert all(set(payload) == {"title", "link"} for _, payload in server.received)
+
+
+def test_rescrape_after_giving_up_posts_each_story_once(server, tmp_path):
+    metas = [{"url": f"https://example.com/{n}", "digest": "d"} for n in range(2)]
+    server.config.error_rate = 1.0
+    first = sender(server, tmp_path, max_attempts=1)
+    for n, meta in enumerate(metas):
+        assert first.submit(story(n), meta=meta).result() is False
+    first.close()
+
+    # The next run replays both entries; scraping the same stories again must not queue them twice
+    server.config.error_rate = 0.0
+    ledger = set()
+    second = sender(server, tmp_path, on_ack=lambda meta: ledger.add(meta["url"]))
+    for n, meta in enumerate(metas):
+        if meta["url"] not in ledger and not second.is_pending(meta):
+            second.submit(story(n), meta=meta)
+    second.close()
+    assert titles(server) == ["Story 0", "Story 1"]
+    assert ledger == {meta["url"] for meta in metas}
+    assert not second.is_pending(metas[0])
+
+
+def test_replay_drops_entries_that_no_longer_need_sending(server, tmp_path):
+    server.config.error_rate = 1.0
+    first = sender(server, tmp_path, max_attempts=1)
+    first.submit(story(0), meta={"url": "https://example.com/0"}).result()
+    first.submit(story(1), meta={"url": "https://example.com/1"}).result()
+    first.close()
+
+    server.config.error_rate = 0.0
+    delivered = {"https://example.com/0"}
+    second = sender(server, tmp_path, should_send=lambda meta: meta["url"] not in delivered)
+    second.start()
+    second.close()
+    assert titles(server) == ["Story 1"]
+    assert second.journal.pending() == []
+
+
+def test_long_lived_sender_retries_what_it_gave_up_on(server, tmp_path):
+    server.config.error_rate = 1.0
+    delivery = sender(server, tmp_path, max_attempts=1)
+    assert delivery.submit(story(0)).result() is False
+
+    server.config.error_rate = 0.0
+    server.config.latency = 0.2
+    in_flight = delivery.submit(story(1))
+    # Story 1 is still being sent, so only story 0 is queued again
+    assert delivery.retry_pending() == 1
+    assert delivery.retry_pending() == 0
+    delivery.flush()
+    assert in_flight.result() is True
+    assert titles(server) == ["Story 0", "Story 1"]
+    delivery.close()
+    assert delivery.journal.pending() == []
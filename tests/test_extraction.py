@@ -0,0 +1,205 @@
+import random
+
+import pytest
+
+import parsing
+from benchserver import AD_PARAGRAPHS, article_html
+from extraction import DEFAULT_AD_PHRASES, AdFilter, ArticleExtractor
+from nytimes import NYTimesScraper
+from parsing import make_soup
+
+PARSERS = ["html.parser", "lxml"]
+SELECTORS = NYTimesScraper.ARTICLE_SELECTORS
+
+LONG = "It carries enough words to pass the length filter applied to article text."
+BROAD = LONG + " This one is long enough for the broad search over every paragraph as well."
+
+
+# The cascade and ad check as they were before the single-pass extractor
+
+def old_is_ad_content(text):
+    ad_indicators = [
+        'subscribe', 'subscription', 'advertisement',
+        'support our journalism', 'times access',
+        'play these games', 'connections', 'spelling bee',
+        'crossword', 'newsletter', 'sign up', 'log in',
+        'create account', 'paywall', 'digital subscription'
+    ]
+    text_lower = text.lower()
+    return any(indicator in text_lower for indicator in ad_indicators)
+
+
+def old_extract_article_content(soup, selectors=SELECTORS, broad_search=True):
+    article_content = []
+    for selector in selectors:
+        content_sections = soup.select(selector)
+        if content_sections:
+            for section in content_sections:
+                for p in section.select('p'):
+                    text = p.get_text(strip=True)
+                    if len(text) > 50 and not old_is_ad_content(text):
+                        article_content.append(text)
+            if article_content:
+                break
+    if not article_content and broad_search:
+        for p in soup.select('p'):
+            text = p.get_text(strip=True)
+            if len(text) > 100 and not old_is_ad_content(text):
+                article_content.append(text)
+    seen = set()
+    unique_content = []
+    for paragraph in article_content:
+        if paragraph not in seen:
+            seen.add(paragraph)
+            unique_content.append(paragraph)
+    return unique_content
+
+
+PAGES = {
+    "article": article_html(7, 30),
+    "fallthrough": (
+        # The first container only has short or ad paragraphs, so a later selector wins
+        '<section name="articleBody"><p>Too short.</p><p>Subscribe now and ' + LONG + '</p></section>'
+        '<div class="css-s99gbd"><p>First real paragraph. ' + LONG + '</p></div>'
+        '<div class="article-body"><p>Lower priority paragraph. ' + LONG + '</p></div>'
+    ),
+    "nested_containers": (
+        '<div class="story-body"><div class="story-body-inner">'
+        '<p>Inside both containers. ' + LONG + '</p></div>'
+        '<p>Inside the outer one. ' + LONG + '</p></div>'
+        '<div class="story-body-trailer"><p>After them. ' + LONG + '</p></div>'
+    ),
+    "multi_valued_class": (
+        '<div class="css-1 StoryBodyCompanionColumn other"><p>Column one. ' + LONG + '</p></div>'
+        '<aside><div data-testid="companionColumn-2"><p>Column two. ' + LONG + '</p></div></aside>'
+    ),
+    "paragraph_is_container": (
+        '<p class="css-at9mc1">The container is the paragraph itself. ' + LONG + '</p>'
+        '<p class="css-at9mc1"><span>Inline markup, ' + LONG + '</span></p>'
+    ),
+    "nested_paragraphs": (
+        '<section class="meteredContent"><p>Outer text. ' + LONG
+        + '<p>Inner text that html.parser nests. ' + LONG + '</p></p></section>'
+    ),
+    "duplicates": (
+        '<section name="articleBody">' + ('<p>Repeated paragraph. ' + LONG + '</p>') * 3 + '</section>'
+        '<section name="articleBody"><p>Repeated paragraph. ' + LONG + '</p></section>'
+    ),
+    "broad_search": (
+        '<div class="promo"><p>Short teaser</p><p>' + BROAD + '</p>'
+        '<p>Sign Up for our NEWSLETTER. ' + BROAD + '</p><p>Medium length paragraph. ' + LONG + '</p></div>'
+    ),
+    "length_limits": (
+        '<div class="article-body">' + ''.join(f'<p>{"x" * n}</p>' for n in (50, 51)) + '</div>'
+        '<div class="promo">' + ''.join(f'<p>{"y" * n}</p>' for n in (100, 101)) + '</div>'
+    ),
+    "broad_length_limits": ''.join(f'<p>{"z" * n}</p>' for n in (100, 101)),
+    "ads_only": ''.join(f'<section name="articleBody"><p>{ad}</p></section>' for ad in AD_PARAGRAPHS),
+    "empty": '<html><body></body></html>',
+}
+
+
+def random_page(seed):
+    """Nested containers with a mix of body classes, short, long, duplicate and ad paragraphs"""
+    rng = random.Random(seed)
+    attributes = [
+        '', 'class="promo"', 'name="articleBody"', 'class="StoryBodyCompanionColumn"',
+        'data-testid="companionColumn-1"', 'class="css-s99gbd"', 'class="css-at9mc1 wide"',
+        'class="story-body-text"', 'class="article-body"', 'class="meteredContent"',
+    ]
+    texts = ["Short one.", LONG, BROAD, "Shared paragraph. " + LONG] + [f"{ad} {LONG}" for ad in AD_PARAGRAPHS]
+
+    def text():
+        value = rng.choice(texts)
+        if rng.random() < 0.5:
+            value = f"Paragraph {rng.randrange(1000)}. {value}"
+        return value.upper() if rng.random() < 0.1 else value
+
+    def element(depth):
+        if depth > 4 or rng.random() < 0.4:
+            return f"<p>{text()}</p>"
+        tag = rng.choice(["div", "section", "article", "span", "p"])
+        if tag == "section" and rng.random() < 0.5:
+            attrs = 'name="articleBody"'
+        else:
+            attrs = rng.choice(attributes)
+        children = "".join(element(depth + 1) for _ in range(rng.randint(1, 4)))
+        return f"<{tag} {attrs}>{children}</{tag}>"
+
+    return "<html><body>" + "".join(element(0) for _ in range(rng.randint(1, 5))) + "</body></html>"
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    # The scraper's stores and delivery journal are created under data/
+    monkeypatch.chdir(tmp_path)
+    return NYTimesScraper()
+
+
+@pytest.fixture(params=PARSERS)
+def parser(request, monkeypatch):
+    monkeypatch.setattr(parsing, "PARSER", request.param)
+    return request.param
+
+
+def check(scraper, markup, parser):
+    expected = old_extract_article_content(make_soup(markup, parser=parser))
+    assert scraper.extract_article_content(make_soup(markup)) == expected
+    # Including the articleBody-only parse that is tried first
+    assert scraper.parse_article(markup) == expected
+    strict = old_extract_article_content(make_soup(markup, parser=parser), broad_search=False)
+    assert scraper.extract_article_content(make_soup(markup), broad_search=False) == strict
+
+
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_fixture_pages_match_the_old_cascade(scraper, parser, name):
+    check(scraper, PAGES[name], parser)
+
+
+def test_random_pages_match_the_old_cascade(scraper, parser):
+    for seed in range(200):
+        check(scraper, random_page(seed), parser)
+
+
+def test_fixture_pages_are_not_trivial(parser):
+    soup = make_soup(PAGES["fallthrough"], parser=parser)
+    content, selector = ArticleExtractor(SELECTORS).extract(soup)
+    assert selector == ".css-s99gbd"
+    assert len(content) == 1
+    assert ArticleExtractor(SELECTORS).extract(make_soup(PAGES["broad_search"], parser=parser)) == ([BROAD], None)
+
+
+AD_SAMPLES = [
+    "", "Nothing to see here.", LONG, "SUBSCRIBE", "Subscriptions are up", "subscrib",
+    "Sign up", "sign-up", "signup", "Log In to continue", "login", "Times Access",
+    "play these game", "Play These Games today", "The connection was lost", "CONNECTIONS",
+    "spelling bees", "a crossword-style puzzle", "newsletters", "create account",
+    "PAYWALL", "digital subscriptions", "support our journalism", "advertisement:",
+    "İstanbul newsletter", "ß paywall", "news letter", "cross word",
+] + AD_PARAGRAPHS
+
+
+@pytest.mark.parametrize("text", AD_SAMPLES)
+def test_ad_filter_matches_old_is_ad_content(text):
+    assert AdFilter()(text) == old_is_ad_content(text)
+
+
+def test_ad_filter_matches_substring_scan_on_random_text():
+    rng = random.Random(0)
+    alphabet = "abcdeghiklnoprstuwy SUBLOG-"
+    ad_filter = AdFilter(DEFAULT_AD_PHRASES)
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        if rng.random() < 0.3:
+            phrase = rng.choice(DEFAULT_AD_PHRASES)
+            cut = rng.randint(len(phrase) - 2, len(phrase))
+            position = rng.randint(0, len(text))
+            text = text[:position] + phrase[:cut].upper() + text[position:]
+        assert ad_filter(text) == old_is_ad_content(text), text
+
+
+def test_custom_phrases_sharing_prefixes():
+    phrases = ["sub", "subscribe", "sign", "sign up", "a.b", "c++"]
+    ad_filter = AdFilter(phrases)
+    for text in ["Su", "SUB", "sig", "Sign", "axb", "a.b", "c+", "c++", "no match"]:
+        assert ad_filter(text) == any(phrase in text.lower() for phrase in phrases), text
@@ -0,0 +1,174 @@
+import email.utils
+import time
+
+import pytest
+import requests
+
+import fetchpolicy
+from fetchpolicy import CircuitBreaker, CircuitOpen, FetchPolicy
+
+URL = "http://example.test/page"
+
+
+class Clock:
+    """Stands in for time.monotonic and time.sleep, so breaker timeouts and backoff take no time"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fetchpolicy.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(fetchpolicy.time, "sleep", clock.sleep)
+    return clock
+
+
+def response(status, headers=None):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update(headers or {})
+    result._content = b""
+    return result
+
+
+class Session:
+    """Returns (or raises) the scripted outcomes in order"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def policy(**options):
+    breaker = CircuitBreaker(failure_threshold=options.pop("failure_threshold", 2), reset_timeout=60)
+    options.setdefault("max_attempts", 1)
+    return FetchPolicy(breaker=breaker, **options)
+
+
+def test_probe_that_raises_unexpectedly_does_not_block_the_host(clock):
+    fetch = policy()
+    fetch.get(Session(response(503)), URL)
+    fetch.get(Session(response(503)), URL)
+    clock.now += 61
+    # The half-open probe dies on something that isn't a request error
+    with pytest.raises(OSError):
+        fetch.get(Session(OSError("cache disk full")), URL)
+    # The next caller gets to probe instead of finding the host blocked for good
+    assert fetch.get(Session(response(200)), URL).status_code == 200
+    assert fetch.get(Session(response(200)), URL).status_code == 200
+
+
+def test_interrupted_probe_is_released(clock):
+    fetch = policy()
+    for _ in range(2):
+        fetch.get(Session(response(500)), URL)
+    clock.now += 61
+    with pytest.raises(KeyboardInterrupt):
+        fetch.get(Session(KeyboardInterrupt()), URL)
+    session = Session(response(200))
+    fetch.get(session, URL)
+    assert session.calls == 1
+
+
+def test_open_circuit_rejects_without_a_request(clock):
+    fetch = policy()
+    for _ in range(2):
+        fetch.get(Session(response(500)), URL)
+    session = Session()
+    with pytest.raises(CircuitOpen):
+        fetch.get(session, URL)
+    assert session.calls == 0
+
+
+def test_success_resets_the_failure_count(clock):
+    fetch = policy()
+    fetch.get(Session(response(500)), URL)
+    fetch.get(Session(response(200)), URL)
+    fetch.get(Session(response(500)), URL)
+    # Two failures, but not in a row
+    assert fetch.get(Session(response(200)), URL).status_code == 200
+
+
+def test_circuit_opens_then_half_opens_then_closes(clock):
+    fetch = policy()
+    for _ in range(2):
+        fetch.get(Session(response(503)), URL)
+    clock.now += 59
+    with pytest.raises(CircuitOpen):
+        fetch.get(Session(), URL)
+    clock.now += 2
+    # Half-open: one caller probes, the rest are turned away until it reports back
+    assert fetch.breaker.allow("example.test")
+    assert not fetch.breaker.allow("example.test")
+    fetch.breaker.cancel("example.test")
+    assert fetch.get(Session(response(200)), URL).status_code == 200
+    # Closed again, with a fresh failure count
+    fetch.get(Session(response(503)), URL)
+    assert fetch.get(Session(response(200)), URL).status_code == 200
+
+
+def test_failed_probe_opens_the_circuit_again(clock):
+    fetch = policy()
+    for _ in range(2):
+        fetch.get(Session(response(503)), URL)
+    clock.now += 61
+    with pytest.raises(requests.ConnectionError):
+        fetch.get(Session(requests.ConnectionError()), URL)
+    clock.now += 59
+    with pytest.raises(CircuitOpen):
+        fetch.get(Session(), URL)
+    clock.now += 2
+    assert fetch.get(Session(response(200)), URL).status_code == 200
+
+
+def test_refusals_count_against_the_circuit_without_retries(clock):
+    fetch = policy(max_attempts=3)
+    session = Session(response(403), response(403))
+    fetch.get(session, URL)
+    fetch.get(session, URL)
+    assert session.calls == 2
+    with pytest.raises(CircuitOpen):
+        fetch.get(Session(), URL)
+
+
+@pytest.mark.parametrize("header", [
+    "120",
+    # An HTTP date about two minutes out
+    lambda: email.utils.formatdate(time.time() + 120, usegmt=True),
+])
+def test_long_retry_after_trips_the_circuit_for_that_long(clock, header):
+    fetch = policy(max_attempts=3, failure_threshold=5, max_delay=30)
+    value = header() if callable(header) else header
+    session = Session(response(429, {"Retry-After": value}))
+    assert fetch.get(session, URL).status_code == 429
+    # Returned at once rather than slept through
+    assert session.calls == 1 and clock.slept == []
+    clock.now += 110
+    with pytest.raises(CircuitOpen):
+        fetch.get(Session(), URL)
+    clock.now += 11
+    assert fetch.get(Session(response(200)), URL).status_code == 200
+
+
+def test_short_retry_after_is_waited_for(clock):
+    fetch = policy(max_attempts=2, failure_threshold=5, max_delay=30)
+    session = Session(response(503, {"Retry-After": "7"}), response(200))
+    assert fetch.get(session, URL).status_code == 200
+    assert clock.slept == [7.0]
@@ -0,0 +1,101 @@
+import pytest
+import requests
+
+import httpcache
+from httpcache import OfflineCacheMiss, ResponseCache
+
+URL = "http://example.test/page"
+
+
+def response(status, body=b"", headers=None):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update(headers or {})
+    result._content = body
+    return result
+
+
+class Session:
+    """Returns the scripted responses in order and records the headers of each request"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def now(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(httpcache.time, "time", lambda: clock[0])
+    return clock
+
+
+def cache(tmp_path, **options):
+    return ResponseCache(str(tmp_path / "cache"), **options)
+
+
+def test_etag_revalidation_serves_the_stored_body_on_304(tmp_path, now):
+    responses = cache(tmp_path)
+    session = Session(response(200, b"first", {"ETag": '"v1"'}), response(304))
+    assert responses.get(session, URL).content == b"first"
+    revalidated = responses.get(session, URL)
+    assert session.requests[1]["If-None-Match"] == '"v1"'
+    assert revalidated.content == b"first"
+    assert revalidated.from_cache
+    assert (responses.misses, responses.revalidated) == (1, 1)
+
+
+def test_last_modified_revalidation_replaces_a_changed_page(tmp_path, now):
+    responses = cache(tmp_path)
+    stamp = "Wed, 01 Jan 2025 00:00:00 GMT"
+    session = Session(
+        response(200, b"old", {"Last-Modified": stamp}),
+        response(200, b"new", {"Last-Modified": "Thu, 02 Jan 2025 00:00:00 GMT"}),
+        response(304),
+    )
+    responses.get(session, URL)
+    assert responses.get(session, URL).content == b"new"
+    assert session.requests[1] == {"If-Modified-Since": stamp}
+    # The changed page is what later revalidations fall back on
+    assert responses.get(session, URL).content == b"new"
+    assert session.requests[2] == {"If-Modified-Since": "Thu, 02 Jan 2025 00:00:00 GMT"}
+
+
+def test_errors_are_not_stored(tmp_path, now):
+    responses = cache(tmp_path)
+    session = Session(response(503, b"busy", {"ETag": '"err"'}), response(200, b"ok"))
+    assert responses.get(session, URL).status_code == 503
+    responses.get(session, URL)
+    assert session.requests[1] == {}
+
+
+def test_fresh_entries_skip_the_network_until_the_ttl_passes(tmp_path, now):
+    responses = cache(tmp_path, ttl=60)
+    session = Session(response(200, b"page", {"ETag": '"v1"'}), response(304))
+    responses.get(session, URL)
+    now[0] += 59
+    assert responses.get(session, URL).content == b"page"
+    assert len(session.requests) == 1
+    now[0] += 2
+    assert responses.get(session, URL).content == b"page"
+    assert len(session.requests) == 2
+    # A 304 restarts the ttl
+    now[0] += 59
+    responses.get(session, URL)
+    assert len(session.requests) == 2
+
+
+def test_offline_mode_serves_only_what_was_recorded(tmp_path, now):
+    cache(tmp_path).get(Session(response(200, b"recorded", {"ETag": '"v1"'})), URL)
+    offline = cache(tmp_path, offline=True)
+    session = Session()
+    # However old the entry, and without asking the network
+    now[0] += 365 * 24 * 3600
+    assert offline.get(session, URL).content == b"recorded"
+    with pytest.raises(OfflineCacheMiss):
+        offline.get(session, URL + "?page=2")
+    assert session.requests == []
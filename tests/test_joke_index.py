@@ -0,0 +1,50 @@
+import jokes
+from joke_index import JokeIndex
+from sinks import TextSink
+
+RECORDS = [
+    {"joke": "Why did the chicken cross the road?\nTo get to the other side.", "username": "@Anonymous"},
+    {"joke": "  Padded joke  ", "username": "@someone"},
+    {"joke": "", "username": "@empty"},
+    {"joke": "Last one", "username": "unknown"},
+]
+
+
+def write_category(directory, name, records):
+    sink = TextSink(str(directory / f"{name}.txt"), name)
+    for record in records:
+        sink.write(record)
+    sink.commit()
+
+
+def test_records_read_the_same_as_iter_jokes(tmp_path, monkeypatch):
+    jokes_dir = tmp_path / "jokes"
+    write_category(jokes_dir, "puns", RECORDS)
+    monkeypatch.setattr(jokes, "OUTPUT_DIR", str(jokes_dir))
+    index = JokeIndex(str(jokes_dir), str(tmp_path / "index"))
+    indexed = [index.get("puns", number) for number in range(1, len(RECORDS) + 1)]
+    assert [joke["number"] for joke in indexed] == [1, 2, 3, 4]
+    # iter_jokes() drops records without a joke; the index keeps their numbers
+    streamed = [{"joke": joke["joke"], "username": joke["username"]} for joke in indexed if joke["joke"]]
+    assert streamed == list(jokes.iter_jokes("puns"))
+
+
+def test_files_without_records_are_not_categories(tmp_path):
+    jokes_dir = tmp_path / "jokes"
+    write_category(jokes_dir, "puns", RECORDS[:1])
+    (jokes_dir / "joke_of_the_day.txt").write_text("")
+    (jokes_dir / "notes.txt").write_text("Not a category file\n")
+    index = JokeIndex(str(jokes_dir), str(tmp_path / "index"))
+    assert index.categories() == {"puns": 1}
+    assert index.category("joke_of_the_day") is None
+    assert index.category("notes") is None
+
+
+def test_reserved_names_are_not_categories(tmp_path):
+    jokes_dir = tmp_path / "jokes"
+    write_category(jokes_dir, "random", RECORDS[:2])
+    write_category(jokes_dir, "puns", RECORDS[:1])
+    index = JokeIndex(str(jokes_dir), str(tmp_path / "index"), reserved=("random",))
+    assert index.categories() == {"puns": 1}
+    assert index.category("random") is None
+    assert index.random()["category"] == "puns"
@@ -0,0 +1,49 @@
+import pytest
+import requests
+
+import jokes
+from benchserver import joke_page_html
+from fetchpolicy import CircuitOpen
+from store import ScraperStore
+
+CATEGORY = {"name": "puns", "url": "http://jokes.test/jokes/puns"}
+
+
+class Policy:
+    """Serves `page` for the category page and raises `error` for anything else"""
+
+    def __init__(self, error, page=None):
+        self.error = error
+        self.page = page
+
+    def get(self, session, url, **kwargs):
+        if url != CATEGORY["url"] or self.page is None:
+            raise self.error
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.page.encode("utf-8")
+        response.encoding = "utf-8"
+        return response
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(jokes, "OUTPUT_DIR", str(tmp_path / "jokes"))
+    monkeypatch.setattr(jokes, "NDJSON_DIR", str(tmp_path / "ndjson"))
+    store = ScraperStore(str(tmp_path / "store.db"))
+    jokes.save_jokes("puns", [{"joke": "A joke from the last crawl", "username": "@a"}], store=store)
+    return store
+
+
+@pytest.mark.parametrize("error", [CircuitOpen("circuit open for jokes.test"), requests.ConnectionError()])
+def test_failed_category_page_keeps_the_stored_jokes(store, error):
+    assert jokes.process_category(CATEGORY, store=store, policy=Policy(error)) == 0
+    assert jokes.load_jokes("puns") == [{"joke": "A joke from the last crawl", "username": "@a"}]
+    assert store.category_counts() == {"puns": 1}
+
+
+def test_failed_load_more_keeps_the_pages_before_it(store):
+    policy = Policy(requests.ConnectionError(), page=joke_page_html("puns", 0, 3))
+    assert jokes.process_category(CATEGORY, store=store, policy=policy) == 3
+    assert len(jokes.load_jokes("puns")) == 3
+    assert store.category_counts() == {"puns": 3}
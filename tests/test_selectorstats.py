@@ -0,0 +1,125 @@
+import random
+import threading
+
+from bs4 import BeautifulSoup
+
+from nytimes import NYTimesScraper
+from selectorstats import SelectorStats
+
+TITLES = NYTimesScraper.TITLE_SELECTORS
+
+
+def story(markup):
+    return BeautifulSoup(f"<div>{markup}</div>", "html.parser").div
+
+
+def title(stats, element):
+    _, found = stats.select("title", element, TITLES)
+    return found.get_text() if found is not None else None
+
+
+def test_fallback_match_does_not_outrank_a_specific_selector(tmp_path):
+    stats = SelectorStats(str(tmp_path / "stats.json"))
+    # Only the broad link fallback matches a story without a headline
+    assert title(stats, story('<a href="/2025/01/01/promo.html">Subscribe for a year</a>')) == "Subscribe for a year"
+    both = story('<a href="/2025/01/01/promo.html">Subscribe for a year</a>'
+                 '<h2><a href="/2025/01/01/story.html">The actual headline</a></h2>')
+    assert title(stats, both) == "The actual headline"
+
+
+def test_known_misses_are_skipped_only_when_absent_from_the_page(tmp_path):
+    stats = SelectorStats(str(tmp_path / "stats.json"), miss_threshold=3)
+    element = story('<h2><a href="/2025/01/01/story.html">The actual headline</a></h2>')
+    for _ in range(3):
+        assert title(stats, element) == "The actual headline"
+    skip = stats.absent("title", [element], TITLES)
+    assert skip == {'[data-tpl="h"] a', "h1 a"}
+    # The rest keep their written order
+    assert stats.order("title", TITLES, skip)[:3] == ["h2 a", "h3 a", ".indicate-hover"]
+    # A known miss that matches in any of the stories isn't skipped
+    assert stats.absent("title", [element, story('<h1><a href="/b">Lead</a></h1>')], TITLES) == {'[data-tpl="h"] a'}
+
+
+def test_demoted_selector_still_wins_where_the_written_cascade_picks_it(tmp_path):
+    stats = SelectorStats(str(tmp_path / "stats.json"), miss_threshold=2)
+    for _ in range(3):
+        title(stats, story('<h2><a href="/a">The actual headline</a></h2>'))
+    assert stats.known_miss("title", "h1 a")
+    page = story('<h1><a href="/b">The lead story headline</a></h1><h2><a href="/c">A second headline</a></h2>')
+    skip = stats.absent("title", [page], TITLES)
+    _, found = stats.select("title", page, TITLES, skip=skip)
+    assert found.get_text() == "The lead story headline"
+    assert not stats.known_miss("title", "h1 a")
+
+
+def random_homepage(rng):
+    """Stories that mix title, summary and time markup, some of it only on some pages"""
+    titles = [
+        '<h1><a href="/h1">Headline in an h1 tag</a></h1>', '<h2><a href="/h2">Headline in an h2 tag</a></h2>',
+        '<h3><a href="/h3">Headline in an h3 tag</a></h3>', '<span class="headline">Headline in a span</span>',
+        '<a href="/2025/01/01/x.html">Headline in a dated link</a>', '<a href="/short">Short</a>',
+    ]
+    summaries = [
+        '<p class="summary-class">Short one</p>', '<p class="summary-class">A summary that is long enough to use</p>',
+        '<div class="css-summary">Brief</div>', '<div class="story-summary">Another summary long enough to use</div>',
+        '<p class="css-1a2b">Generic paragraph text long enough</p>', '<p class="css-1a2b">Tiny</p>',
+        '<div class="css-sarx3u"><p>The example summary, long enough</p></div>',
+    ]
+    times = ['<time>Jan 1</time>', '<span datetime="2025-01-01">Jan 1</span>', '<span data-time="1">1h ago</span>']
+    # Each page only uses some of the markup, so selectors miss for a while and come back
+    kinds = [rng.sample(options, rng.randint(1, len(options))) for options in (titles, summaries, times)]
+    stories = []
+    for _ in range(rng.randint(1, 6)):
+        parts = [rng.choice(options) for options in kinds for _ in range(rng.randint(0, 2))]
+        rng.shuffle(parts)
+        stories.append('<div data-tpl="sli">' + "".join(parts) + "</div>")
+    return BeautifulSoup("<html><body>" + "".join(stories) + "</body></html>", "html.parser")
+
+
+def test_skipping_never_changes_what_a_story_extracts(tmp_path, monkeypatch):
+    # The scraper's stores and delivery journal are created under data/
+    monkeypatch.chdir(tmp_path)
+    learning = NYTimesScraper(selector_stats=SelectorStats(str(tmp_path / "learning.json"), miss_threshold=2))
+    written = NYTimesScraper(selector_stats=SelectorStats(None))
+    rng = random.Random(0)
+    skipped = 0
+    for _ in range(300):
+        page = random_homepage(rng)
+        elements = page.select('[data-tpl="sli"]')
+        skip = learning.absent_selectors(elements)
+        skipped += sum(len(selectors) for selectors in skip.values())
+        for element in elements:
+            assert learning.extract_story_data(element, skip) == written.extract_story_data(element)
+    assert skipped
+
+
+def test_saves_merge_across_instances(tmp_path):
+    path = str(tmp_path / "stats.json")
+    first, second = SelectorStats(path), SelectorStats(path)
+    first.miss("title", "h1 a")
+    second.miss("title", "h1 a")
+    second.miss("summary", ".summary-class")
+    first.save()
+    second.save()
+    assert SelectorStats(path).misses == {"title": {"h1 a": 2}, "summary": {".summary-class": 1}}
+
+    first.record("title", "h1 a")
+    first.save()
+    assert SelectorStats(path).misses["title"]["h1 a"] == 0
+
+
+def test_concurrent_saves_keep_every_miss(tmp_path):
+    path = str(tmp_path / "stats.json")
+    instances = [SelectorStats(path) for _ in range(4)]
+
+    def work(stats):
+        for _ in range(50):
+            stats.miss("title", "h1 a")
+            stats.save()
+
+    threads = [threading.Thread(target=work, args=(stats,)) for stats in instances]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert SelectorStats(path).misses["title"]["h1 a"] == 200
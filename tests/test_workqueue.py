@@ -0,0 +1,153 @@
+import pytest
+
+import jokes
+import workqueue
+from benchserver import joke_page_html
+from crawl import JOKES, CrawlWorker
+from workqueue import WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / "queue.db"), lease_seconds=60, max_attempts=2)
+
+
+@pytest.fixture
+def now(monkeypatch):
+    """Frozen time.time() for lease expiry, moved on by the test"""
+    clock = [1000.0]
+    monkeypatch.setattr(workqueue.time, "time", lambda: clock[0])
+    return clock
+
+
+def test_put_starts_a_finished_task_over(queue):
+    queue.put("q", "g", 0, {"v": 1})
+    task = queue.lease("q", "w1")
+    queue.ack(task, "w1", {"old": True})
+    queue.put("q", "g", 0, {"v": 2})
+    assert queue.results("q", "g") == [(0, "pending", {"v": 2}, None)]
+    assert queue.lease("q", "w1").attempts == 1
+
+
+def test_seed_drops_what_an_earlier_run_left(queue):
+    queue.seed("q", "g", [(0, {"run": 1}), (1, {"run": 1}), (2, {"run": 1})])
+    for _ in range(3):
+        queue.ack(queue.lease("q", "w1"), "w1", {"run": 1})
+    queue.seed("q", "g", [(0, {"run": 2})])
+    assert queue.results("q", "g") == [(0, "pending", {"run": 2}, None)]
+    assert queue.outstanding("q", "g") == 1
+
+
+def test_follow_up_is_queued_with_the_ack(queue):
+    queue.put("q", "g", 0, {})
+    task = queue.lease("q", "w1")
+    task.follow_up = (1, {"next": True})
+    assert queue.ack(task, "w1", {})
+    assert [(seq, status) for seq, status, _, _ in queue.results("q", "g")] == [(0, "done"), (1, "pending")]
+
+
+def test_follow_up_of_a_lost_lease_is_dropped(queue):
+    queue.put("q", "g", 0, {})
+    task = queue.lease("q", "w1")
+    task.follow_up = (1, {})
+    assert not queue.ack(task, "someone-else", {})
+    assert [seq for seq, _, _, _ in queue.results("q", "g")] == [0]
+
+
+def test_expired_lease_goes_to_the_next_worker(queue, now):
+    queue.put("q", "g", 0, {})
+    crashed = queue.lease("q", "w1")
+    assert queue.lease("q", "w2") is None
+    now[0] += 61
+    task = queue.lease("q", "w2")
+    assert (task.id, task.attempts) == (crashed.id, 2)
+    # The first worker coming back late can't overwrite the new lease's outcome
+    assert not queue.ack(crashed, "w1", {"late": True})
+    assert not queue.fail(crashed, "w1", "late")
+    assert queue.ack(task, "w2", {"ok": True})
+    assert queue.results("q", "g") == [(0, "done", {}, {"ok": True})]
+
+
+def test_extended_lease_is_kept(queue, now):
+    queue.put("q", "g", 0, {})
+    task = queue.lease("q", "w1")
+    now[0] += 50
+    assert queue.extend(task, "w1")
+    now[0] += 50
+    assert queue.lease("q", "w2") is None
+    now[0] += 11
+    assert queue.lease("q", "w2") is not None
+    assert not queue.extend(task, "w1")
+
+
+def test_task_that_keeps_crashing_its_worker_fails(queue, now):
+    queue.put("q", "g", 0, {})
+    for worker in ("w1", "w2"):
+        assert queue.lease("q", worker) is not None
+        now[0] += 61
+    assert queue.lease("q", "w3") is None
+    assert queue.counts("q") == {"failed": 1}
+    assert queue.outstanding("q") == 0
+
+
+def test_failed_task_is_retried_until_its_attempts_run_out(queue):
+    queue.put("q", "g", 0, {})
+    assert queue.fail(queue.lease("q", "w1"), "w1", "timeout")
+    assert queue.counts("q") == {"pending": 1}
+    assert queue.fail(queue.lease("q", "w2"), "w2", "timeout")
+    assert queue.counts("q") == {"failed": 1}
+    assert queue.lease("q", "w3") is None
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Serves scripted joke pages to the workers and records which ones they fetched"""
+    served = {}
+    fetched = []
+
+    def fetch_pages(category_url, session, limiter, cache=None, start_load=0, max_loads=10, policy=None):
+        fetched.append(start_load)
+        yield start_load, served[start_load]
+
+    monkeypatch.setattr(jokes, "fetch_pages", fetch_pages)
+    return served, fetched
+
+
+def crawl(queue, max_loads):
+    queue.seed(JOKES, "puns", [(0, {"name": "puns", "url": "http://jokes.test/jokes/puns", "max_loads": max_loads})])
+    CrawlWorker(queue, limiter=None, queues=(JOKES,), poll=0.01).run()
+
+
+def test_category_paging_stops_at_a_page_without_new_jokes(queue, pages):
+    served, fetched = pages
+    served.update({n: joke_page_html("puns", n, 5) for n in range(6)})
+    # Page 2 repeats page 1, so process_category() would stop there
+    served[2] = served[1]
+    crawl(queue, max_loads=10)
+    assert fetched == [0, 1, 2]
+    assert queue.outstanding(JOKES) == 0
+
+
+def test_category_paging_stops_at_an_empty_page_and_at_max_loads(queue, pages):
+    served, fetched = pages
+    served.update({n: joke_page_html("puns", n, 5) for n in range(3)})
+    served[3] = joke_page_html("puns", 3, 0)
+    crawl(queue, max_loads=10)
+    assert fetched == [0, 1, 2, 3]
+
+    fetched.clear()
+    crawl(queue, max_loads=1)
+    assert fetched == [0, 1]
+
+
+def test_page_of_a_crashed_worker_is_crawled_once_its_lease_expires(queue, pages, now):
+    served, fetched = pages
+    served.update({n: joke_page_html("puns", n, 5) for n in range(3)})
+    served[3] = joke_page_html("puns", 3, 0)
+    queue.seed(JOKES, "puns", [(0, {"name": "puns", "url": "http://jokes.test/jokes/puns", "max_loads": 10})])
+    # A worker leases the category page and dies without acking it
+    assert queue.lease(JOKES, "crashed") is not None
+    now[0] += 61
+    CrawlWorker(queue, limiter=None, queues=(JOKES,), poll=0.01).run()
+    assert fetched == [0, 1, 2, 3]
+    assert [status for _, status, _, _ in queue.results(JOKES, "puns")] == ["done"] * 4
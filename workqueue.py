@@ -0,0 +1,200 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from sqlitedb import SQLiteDatabase
+
+DEFAULT_QUEUE_PATH = os.getenv("SCRAPER_QUEUE_DB", os.path.join("data", "workqueue.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    queue TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (queue, grp, seq)
+);
+CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (queue, status, lease_expires);
+"""
+
+# Adding a task that already exists starts it over, whatever an earlier run left in it
+UPSERT = (
+    "INSERT INTO tasks (queue, grp, seq, payload, updated_at) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (queue, grp, seq) DO UPDATE SET payload = excluded.payload, status = 'pending', "
+    "attempts = 0, lease_owner = NULL, lease_expires = NULL, result = NULL, error = NULL, "
+    "updated_at = excluded.updated_at"
+)
+
+
+class Task:
+    """One leased unit of work"""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.queue = row["queue"]
+        self.group = row["grp"]
+        self.seq = row["seq"]
+        self.payload = json.loads(row["payload"])
+        self.attempts = row["attempts"]
+        # (seq, payload) of a task in the same group that the handler wants queued with its ack
+        self.follow_up = None
+
+
+class WorkQueue(SQLiteDatabase):
+    """SQLite-backed task queue shared by worker processes.
+
+    Tasks are identified by (queue, group, seq), e.g. ("jokes", category, load page). A
+    worker leases a task for `lease_seconds`; if it neither acks nor fails it in that time
+    (because it crashed) the task becomes available to other workers again. Tasks that
+    keep failing are marked failed after `max_attempts` leases.
+    """
+
+    schema = SCHEMA
+    row_factory = sqlite3.Row
+    # Transactions are opened with BEGIN IMMEDIATE explicitly
+    autocommit = True
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_seconds=120, max_attempts=3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        super().__init__(path)
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction that takes the database lock up front, so lease races can't happen"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def put(self, queue, group, seq, payload):
+        """Add a task, resetting a task with the same (queue, group, seq) to pending"""
+        with self.transaction() as conn:
+            conn.execute(UPSERT, (queue, group, seq, json.dumps(payload, ensure_ascii=False), time.time()))
+
+    def seed(self, queue, group, tasks):
+        """Start a group afresh with `tasks`, (seq, payload) pairs, dropping what an earlier run left in it"""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM tasks WHERE queue = ? AND grp = ?", (queue, group))
+            conn.executemany(UPSERT, [
+                (queue, group, seq, json.dumps(payload, ensure_ascii=False), now) for seq, payload in tasks
+            ])
+
+    def lease(self, queue, worker):
+        """Claim the oldest available task in `queue`, or None when there is nothing to do right now"""
+        now = time.time()
+        with self.transaction() as conn:
+            # Leases that ran out once too often belong to tasks that crash their workers
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', error = 'lease expired', lease_owner = NULL, updated_at = ? "
+                "WHERE queue = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, queue, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT * FROM tasks WHERE queue = ? "
+                "AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY grp, seq LIMIT 1",
+                (queue, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                "updated_at = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row["id"]),
+            )
+        task = Task(row)
+        task.attempts += 1
+        return task
+
+    def extend(self, task, worker):
+        """Renew a lease for a long-running task; False if the lease was lost to another worker"""
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (time.time() + self.lease_seconds, time.time(), task.id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def ack(self, task, worker, result=None):
+        """Mark a task done; ignored (returns False) if the lease expired and it was handed to someone else.
+
+        The task's follow_up is queued in the same transaction, so its group never looks
+        finished in between.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (json.dumps(result, ensure_ascii=False), now, task.id, worker),
+            )
+            acked = cursor.rowcount == 1
+            if acked and task.follow_up is not None:
+                seq, payload = task.follow_up
+                conn.execute(UPSERT, (task.queue, task.group, seq, json.dumps(payload, ensure_ascii=False), now))
+        return acked
+
+    def fail(self, task, worker, error):
+        """Give a task back for another attempt, or mark it failed once it has used up its attempts"""
+        status = "failed" if task.attempts >= self.max_attempts else "pending"
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, error = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (status, str(error), time.time(), task.id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def outstanding(self, queue, group=None):
+        """Number of tasks still pending or leased"""
+        sql = "SELECT COUNT(*) FROM tasks WHERE queue = ? AND status IN ('pending', 'leased')"
+        params = [queue]
+        if group is not None:
+            sql += " AND grp = ?"
+            params.append(group)
+        return self.connection().execute(sql, params).fetchone()[0]
+
+    def groups(self, queue):
+        rows = self.connection().execute(
+            "SELECT DISTINCT grp FROM tasks WHERE queue = ? ORDER BY grp", (queue,)
+        ).fetchall()
+        return [row["grp"] for row in rows]
+
+    def results(self, queue, group):
+        """(seq, status, payload, result) for every task in a group, in seq order"""
+        rows = self.connection().execute(
+            "SELECT seq, status, payload, result FROM tasks WHERE queue = ? AND grp = ? ORDER BY seq",
+            (queue, group),
+        ).fetchall()
+        return [
+            (row["seq"], row["status"], json.loads(row["payload"]), json.loads(row["result"]) if row["result"] else None)
+            for row in rows
+        ]
+
+    def clear(self, queue, group):
+        """Forget a group once its results have been collected"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM tasks WHERE queue = ? AND grp = ?", (queue, group))
+
+    def counts(self, queue):
+        rows = self.connection().execute(
+            "SELECT status, COUNT(*) AS tasks FROM tasks WHERE queue = ? GROUP BY status", (queue,)
+        ).fetchall()
+        return {row["status"]: row["tasks"] for row in rows}